@@ -1,38 +1,64 @@
 import re
 from typing import List, Dict
-import tiktoken
+from transformers import AutoTokenizer
+from backend.core.config import settings
 
 
 class LegalChunker:
     """
     Chunk legal text while preserving section and clause boundaries.
+    Token counts use the embedding model's own tokenizer, so chunk_size is
+    measured against the embedder's real context budget and the token ids
+    can be handed straight to the embedder.
     """
 
+    _SECTION_RE = re.compile(
+        r"(SECTION\s+\d+|Section\s+\d+|CLAUSE\s+\d+|Clause\s+\d+)"
+    )
+
     def __init__(
         self,
-        chunk_size: int = 700,
-        chunk_overlap: int = 100,
-        model_name: str = "gpt-3.5-turbo"
+        chunk_size: int = None,
+        chunk_overlap: int = None,
+        model_name: str = None
     ):
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
-        self.tokenizer = tiktoken.encoding_for_model(model_name)
+        self.chunk_size = chunk_size or settings.chunk_size
+        self.chunk_overlap = (
+            settings.chunk_overlap if chunk_overlap is None else chunk_overlap
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            model_name or settings.embedding_model_name,
+            use_fast=True
+        )
+
+        # Anything beyond the model's context is silently truncated by the
+        # embedder, so reject sizes that cannot fit
+        reserved = (
+            self.tokenizer.num_special_tokens_to_add()
+            + self._count_tokens("passage: ")
+        )
+        max_tokens = self.tokenizer.model_max_length - reserved
+        if self.chunk_size + self.chunk_overlap > max_tokens:
+            raise ValueError(
+                f"chunk_size + chunk_overlap ({self.chunk_size} + "
+                f"{self.chunk_overlap}) exceeds the embedding model's "
+                f"{max_tokens}-token budget"
+            )
 
     def _count_tokens(self, text: str) -> int:
-        return len(self.tokenizer.encode(text))
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
 
     def _split_by_sections(self, text: str) -> List[str]:
         """
         Split text by legal sections/clauses.
         """
-        pattern = r"(SECTION\s+\d+|Section\s+\d+|CLAUSE\s+\d+|Clause\s+\d+)"
-        splits = re.split(pattern, text)
+        splits = self._SECTION_RE.split(text)
 
         sections = []
         buffer = ""
 
         for part in splits:
-            if re.match(pattern, part):
+            if self._SECTION_RE.match(part):
                 if buffer.strip():
                     sections.append(buffer.strip())
                 buffer = part
@@ -44,6 +70,29 @@ class LegalChunker:
 
         return sections
 
+    def _split_oversized(self, section: str, ids: List[int], offsets: List[tuple]):
+        """
+        Cut a section longer than chunk_size into chunk_size-token windows,
+        so no chunk outgrows the embedder's context and gets truncated.
+        Returns (text, ids, offsets) per window, offsets relative to its text.
+        """
+        if len(ids) <= self.chunk_size:
+            return [(section, ids, offsets)]
+
+        pieces = []
+        for first in range(0, len(ids), self.chunk_size):
+            last = min(first + self.chunk_size, len(ids))
+            # Each window runs up to the next window's first token, so the
+            # text between them is kept too
+            start = 0 if first == 0 else offsets[first][0]
+            end = offsets[last][0] if last < len(ids) else len(section)
+            pieces.append((
+                section[start:end].rstrip(),
+                ids[first:last],
+                [(a - start, b - start) for a, b in offsets[first:last]]
+            ))
+        return pieces
+
     def chunk_text(self, text: str, metadata: Dict) -> List[Dict]:
         """
         Main chunking method.
@@ -52,48 +101,83 @@ class LegalChunker:
         sections = self._split_by_sections(text)
         chunks = []
 
-        current_chunk = ""
-        current_tokens = 0
-
-        for section in sections:
-            section_tokens = self._count_tokens(section)
-
-            if current_tokens + section_tokens <= self.chunk_size:
-                if current_chunk:
-                    current_chunk += "\n\n" + section
-                else:
-                    current_chunk = section
-                current_tokens += section_tokens
-            else:
-                if current_chunk.strip():
-                    chunks.append({
-                        "text": current_chunk.strip(),
-                        "metadata": metadata
-                    })
+        # Tokenize all sections in one call (fast tokenizer batches in Rust).
+        # Offsets map tokens back to the original text: the overlap is cut
+        # from the source string, since decoding ids is lossy (the uncased
+        # WordPiece vocabulary lowercases, strips accents and has no
+        # Devanagari)
+        encodings = []
+        offsets = []
+        if sections:
+            encoded = self.tokenizer(
+                sections,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                verbose=False
+            )
+            encodings = encoded["input_ids"]
+            offsets = encoded["offset_mapping"]
+
+        pieces = [
+            piece
+            for section, section_ids, section_offsets in zip(sections, encodings, offsets)
+            for piece in self._split_oversized(section, section_ids, section_offsets)
+        ]
+
+        current_parts: List[str] = []
+        current_ids: List[int] = []
+        # Start of each token, as a character offset into the chunk text
+        current_starts: List[int] = []
+        chunk_token_ids: List[List[int]] = []
+        chunk_token_starts: List[List[int]] = []
+
+        for section, section_ids, section_offsets in pieces:
+            if current_parts and len(current_ids) + len(section_ids) > self.chunk_size:
+                chunks.append({
+                    "text": "\n\n".join(current_parts),
+                    "metadata": metadata
+                })
+                chunk_token_ids.append(current_ids)
+                chunk_token_starts.append(current_starts)
 
                 # Start new chunk
-                current_chunk = section
-                current_tokens = section_tokens
+                current_parts, current_ids, current_starts = [], [], []
 
-        if current_chunk.strip():
+            # Sections are stripped, so "\n\n".join(parts) is the chunk text
+            base = len("\n\n".join(current_parts)) + 2 if current_parts else 0
+            current_parts.append(section)
+            current_ids.extend(section_ids)
+            current_starts.extend(base + start for start, _ in section_offsets)
+
+        if current_parts:
             chunks.append({
-                "text": current_chunk.strip(),
+                "text": "\n\n".join(current_parts),
                 "metadata": metadata
             })
+            chunk_token_ids.append(current_ids)
+            chunk_token_starts.append(current_starts)
 
-        # Add overlap (simple backward overlap)
+        # Add overlap: the last `chunk_overlap` tokens of the previous chunk.
+        # Token ids travel with each chunk so the embedder can skip
+        # re-tokenizing the text.
         final_chunks = []
         for i, chunk in enumerate(chunks):
-            if i == 0:
+            overlap_ids = []
+            if i > 0 and self.chunk_overlap > 0:
+                overlap_ids = chunk_token_ids[i - 1][-self.chunk_overlap:]
+
+            if not overlap_ids:
+                chunk["input_ids"] = chunk_token_ids[i]
                 final_chunks.append(chunk)
             else:
-                prev_text = final_chunks[-1]["text"]
-                overlap_text = prev_text[-self.chunk_overlap:]
-                merged_text = overlap_text + "\n\n" + chunk["text"]
+                overlap_start = chunk_token_starts[i - 1][-len(overlap_ids)]
+                overlap_text = chunks[i - 1]["text"][overlap_start:]
+                merged_text = "".join((overlap_text, "\n\n", chunk["text"]))
 
                 final_chunks.append({
                     "text": merged_text,
-                    "metadata": metadata
+                    "metadata": metadata,
+                    "input_ids": overlap_ids + chunk_token_ids[i]
                 })
 
         return final_chunks
@@ -0,0 +1,66 @@
+"""
+Micro-batching
+Coalesces concurrent single-item calls into one batched call
+"""
+
+import threading
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import Any, Callable, List, Tuple
+
+from backend.core.logging import get_logger
+
+logger = get_logger()
+
+
+class MicroBatcher:
+    """
+    Daemon worker that gathers items submitted from many threads and runs
+    them through process_batch together. A batch closes when max_batch
+    items are queued or window_seconds pass without a new one.
+    
+    GPU/BLAS work (generation, translation, ANN search) costs about the
+    same for one item as for a small batch, so concurrent requests share
+    a call instead of queueing behind each other.
+    """
+    
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch: int,
+        window_seconds: float,
+        name: str = "micro-batcher"
+    ):
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.window_seconds = window_seconds
+        self._queue: "Queue[Tuple[Any, Future]]" = Queue()
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+    
+    def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result (exceptions are re-raised)"""
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+    
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            try:
+                # Fill the batch until the window closes
+                while len(pending) < self.max_batch:
+                    pending.append(self._queue.get(timeout=self.window_seconds))
+            except Empty:
+                pass
+            
+            try:
+                results = self.process_batch([item for item, _ in pending])
+            except Exception as e:
+                logger.error(f"{self._worker.name}: batch of {len(pending)} failed: {e}")
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(pending, results):
+                future.set_result(result)
@@ -16,30 +16,91 @@ class Settings(BaseSettings):
     llm_api_key: str = ""
     llm_api_base_url: str = "http://localhost:8000/v1"
     llm_max_tokens: int = 512
-    llm_temperature: float = 0.3
+    llm_temperature: float = 0.3  # 0 = greedy (deterministic) decoding
+    llm_dtype: str = "auto"  # auto (bf16; fp16 on pre-Ampere GPUs, fp32 on CPUs without AVX512-BF16/AMX) | bfloat16 | float16 | float32 | int8
+    llm_cache_system_prompt: bool = True  # prefill the system prompt once, reuse its KV cache
+    llm_batch_size: int = 8  # max concurrent prompts per generate() call (1 = no batching)
+    llm_batch_window_ms: int = 5  # how long a batch waits for more prompts
+    llm_token_cache_size: int = 4096  # retrieved chunks whose token ids are kept
+    llm_context_token_budget: int = 3000  # max retrieved-context tokens per prompt (0 = unlimited)
+    
+    # Semantic response cache (near-duplicate queries reuse past answers)
+    # Off by default: e5 query similarities sit in a narrow high band, so
+    # tune the threshold on logged query pairs before enabling
+    response_cache_size: int = 0  # entries (e.g. 1000); 0 disables the response cache
+    response_cache_threshold: float = 0.98  # min cosine similarity of queries for a hit
+    response_cache_path: str = ""  # persist across restarts (e.g. ./data/indexes/response_cache)
     
     # Embedding Configuration
     embedding_model_name: str = "intfloat/e5-large-v2"
-    embedding_device: str = "cpu"
+    embedding_device: str = "auto"  # auto | cpu | cuda | mps
+    embedding_batch_size: int = 0  # 0 = pick by device (64 GPU, 16 CPU)
+    embedding_backend: str = "torch"  # torch | onnx
+    embedding_onnx_quantize: bool = False  # int8 dynamic quantization (AVX512-VNNI)
+    embedding_onnx_dir: str = "./data/onnx_models"
+    embedding_cache_size: int = 10000  # 0 disables the embedding cache
+    # fp16 embeddings persisted across runs (re-ingests skip the encoder); "" = memory only
+    embedding_disk_cache_dir: str = "./data/embedding_cache"
+    embedding_half_precision: bool = True  # fp16 weights on CUDA
     
     # Vector Store
     faiss_index_path: str = "./data/faiss_index"
-    chunk_size: int = 700
+    faiss_index_type: str = "hnsw"  # hnsw | flat (exact, brute force) | ivfpq
+    faiss_hnsw_m: int = 32  # graph neighbours per node
+    faiss_hnsw_ef_construction: int = 80
+    faiss_hnsw_ef_search: int = 64  # higher = better recall, slower queries
+    faiss_scalar_quantizer: str = "fp16"  # none | fp16 (2x smaller) | int8 (4x)
+    faiss_sq_min_training_vectors: int = 1000  # int8: first batch that sets the per-dimension ranges
+    faiss_ivf_nlist: int = 256  # ivfpq: coarse clusters
+    faiss_ivf_nprobe: int = 16  # ivfpq: clusters scanned per query
+    faiss_pq_m: int = 16  # ivfpq: bytes per vector (must divide the dimension)
+    faiss_pq_nbits: int = 8
+    faiss_save_interval_seconds: float = 2.0  # coalescing window for background saves
+    faiss_use_gpu: bool = False  # search on GPU 0 (faiss-gpu; needs flat + faiss_scalar_quantizer "none", or ivfpq)
+    retrieval_batch_size: int = 32  # concurrent queries per FAISS search call
+    retrieval_batch_window_ms: int = 3  # Retriever.retrieve coalescing window (0 = off)
+    # Tokens of the embedding model; chunk_size + chunk_overlap must fit
+    # its context (512 for e5-large-v2, minus the "passage: " prefix)
+    chunk_size: int = 400
     chunk_overlap: int = 100
+    # Bulk ingestion drops chunks more similar than this to an earlier one
+    # (0 = off). Provisions differing only in a section number or penalty
+    # can exceed 0.98, so enable with care; dropped chunks are logged.
+    ingest_dedup_threshold: float = 0.0
     
     # Database
     database_url: str = "postgresql://localhost:5432/nyaasahayak"
     db_pool_size: int = 10
     db_max_overflow: int = 20
+    db_pool_recycle_seconds: int = 1800  # replace connections older than this
+    db_pool_pre_ping: bool = False  # SELECT 1 per checkout (extra round-trip)
+    query_log_batch_size: int = 100  # QueryLog rows per INSERT
+    query_log_flush_interval_ms: int = 200  # max wait for a batch to fill
     
     # Translation
     default_language: str = "en"
     supported_languages: List[str] = ["en", "hi"]
-    translation_model: str = "indicnlp/IndicTrans2"
+    translation_model: str = "facebook/nllb-200-distilled-600M"
+    translation_device: str = "auto"  # auto | cpu | cuda | mps
+    translation_quantize: bool = True  # int8 (bitsandbytes on CUDA, dynamic on CPU)
+    translation_batch_size: int = 16  # sentences per generate() call
+    translation_max_new_tokens: int = 256
+    translation_batch_window_ms: int = 100  # translate_text coalescing window (0 = off)
+    # Load the translation model at API import (e.g. gunicorn preload_app)
+    preload_translation_model: bool = False
+    # fastText lid.176 (download lid.176.ftz from fasttext.cc); langdetect if absent
+    language_id_model_path: str = "./data/models/lid.176.ftz"
     
     # OCR
     tesseract_path: str = "/usr/bin/tesseract"
     tesseract_lang: str = "eng+hin"
+    # PSM 6: single uniform text block (skips layout analysis); OEM 1: LSTM only
+    tesseract_config: str = "--psm 6 --oem 1 -c preserve_interword_spaces=1"
+    # Pages taller than this are downscaled before OCR (0 disables)
+    ocr_max_height: int = 1800
+    # "adaptive" (Gaussian, needs OpenCV) or "otsu"
+    ocr_binarization: str = "adaptive"
+    ocr_deskew: bool = True
     
     # Document Storage
     upload_dir: str = "./data/uploads"
@@ -4,13 +4,29 @@ Uses loguru for structured, context-aware logging
 """
 
 import sys
+import threading
 from loguru import logger
 from pathlib import Path
 from .config import settings
 
+_configured = False
+_configure_lock = threading.Lock()
+
 
 def setup_logging():
-    """Configure application-wide logging"""
+    """
+    Configure application-wide logging (idempotent)
+    
+    Called from entry points (API startup, script main()), not at import,
+    so library imports and worker processes don't re-add handlers.
+    Handlers are enqueue-backed: log calls only put a record on a queue
+    and a background thread does the console/file I/O.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return logger
+        _configured = True
     
     # Remove default handler
     logger.remove()
@@ -21,6 +37,7 @@ def setup_logging():
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
         level=settings.log_level,
         colorize=True,
+        enqueue=True,
     )
     
     # File handler
@@ -34,16 +51,20 @@ def setup_logging():
         rotation="10 MB",
         retention="30 days",
         compression="zip",
+        enqueue=True,
+        backtrace=False,
+        diagnose=False,
     )
     
     logger.info("Logging configured successfully")
     return logger
 
 
-# Initialize logger
-app_logger = setup_logging()
-
-
 def get_logger():
-    """Get application logger instance"""
-    return app_logger
+    """
+    Get application logger instance
+    
+    Records go to loguru's default stderr handler until setup_logging()
+    runs; loguru's logger is process-global, so it applies retroactively.
+    """
+    return logger
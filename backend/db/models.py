@@ -1,14 +1,33 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, JSON
-from sqlalchemy.dialects.postgresql import UUID
-from pgvector.sqlalchemy import Vector
+from typing import Dict, List
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Index, insert, event, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from pgvector.sqlalchemy import HALFVEC
+import os
+import time
 import uuid
 from datetime import datetime
 from backend.db.session import Base
 
+
+def _uuid7() -> uuid.UUID:
+    """
+    Time-ordered UUIDv7 (RFC 9562): 48-bit Unix ms timestamp, then random
+    bits. New primary keys land at the right edge of the btree instead of
+    on a random leaf page as uuid4 keys do.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+
+# Python 3.14+ ships uuid.uuid7
+uuid7 = getattr(uuid, "uuid7", _uuid7)
+
 class Document(Base):
     __tablename__ = "documents"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     filename = Column(String, nullable=False)
     source_type = Column(String)
     language = Column(String)
@@ -18,18 +37,132 @@ class Document(Base):
 class Chunk(Base):
     __tablename__ = "chunks"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"))
     text = Column(String)
-    metadata_json = Column(JSON)
-    embedding = Column(Vector(1024))  # Adjust dimension based on your model (e5-large is usually 1024)
+    metadata_json = Column(JSONB)  # binary JSON: parsed once on write, not per read
+    # fp16 vectors (pgvector >= 0.7): half the storage and index size of
+    # vector(1024); recall loss is negligible for normalized embeddings
+    embedding = Column(HALFVEC(1024))  # Adjust dimension based on your model (e5-large is usually 1024)
     faiss_index_id = Column(Integer)  # Keeping for backward compatibility or hybrid use
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # ANN index for cosine similarity search (pgvector >= 0.5)
+        Index(
+            "chunks_embedding_hnsw_idx",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "halfvec_cosine_ops"},
+        ),
+    )
+
+def bulk_insert_chunks(session, rows: List[Dict], return_ids: bool = False, page_size: int = 1000):
+    """
+    Insert many chunk rows with multi-row INSERT statements
+
+    SQLAlchemy 2.0 "insertmanyvalues" batches the rows into
+    INSERT ... VALUES (...), (...) statements of page_size rows (with
+    RETURNING when ids are requested), instead of one round-trip per row.
+    Embeddings are serialized once by pgvector's HALFVEC bind processor
+    (which also does the fp16 conversion); pass them as float arrays, not
+    pre-formatted strings.
+
+    Args:
+        session: Active SQLAlchemy session (caller commits)
+        rows: Column dicts (document_id, text, embedding, ...)
+        return_ids: Return the inserted chunk ids, in row order
+        page_size: Rows per INSERT statement
+
+    Returns:
+        List of chunk ids if return_ids, else None
+    """
+    if not rows:
+        return [] if return_ids else None
+
+    stmt = insert(Chunk).execution_options(insertmanyvalues_page_size=page_size)
+    if return_ids:
+        stmt = stmt.returning(Chunk.id, sort_by_parameter_order=True)
+        return list(session.scalars(stmt, rows))
+    session.execute(stmt, rows)
+    return None
+
 class QueryLog(Base):
     __tablename__ = "query_logs"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Partitioned by month on timestamp, which must be part of the primary key
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     query_text = Column(String)
     language = Column(String)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Per-language analytics ("Hindi queries per day")
+        Index("ix_query_logs_lang_ts", "language", "timestamp"),
+        # Time-range scans; inserts are time-ordered, so a BRIN summary is
+        # a tiny fraction of a btree's size
+        Index("ix_query_logs_ts_brin", "timestamp", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+
+def create_query_log_partitions(conn, months_ahead: int = 2):
+    """
+    Create monthly query_logs partitions from this month through
+    months_ahead months ahead (idempotent), plus a DEFAULT partition so
+    inserts never fail when a month has not been created yet
+
+    Rows that already landed in the DEFAULT partition for a month being
+    created are moved into the new partition; otherwise Postgres refuses
+    to create it ("updated partition constraint for default partition
+    would be violated") and every later start fails the same way.
+
+    Args:
+        conn: SQLAlchemy connection
+        months_ahead: Number of future months to pre-create
+    """
+    has_default = conn.execute(text(
+        "SELECT to_regclass('query_logs_default') IS NOT NULL"
+    )).scalar()
+    now = datetime.utcnow()
+    year, month = now.year, now.month
+    for _ in range(months_ahead + 1):
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        name = f"query_logs_y{year}m{month:02d}"
+        start, end = f"{year}-{month:02d}-01", f"{next_year}-{next_month:02d}-01"
+        exists = conn.execute(text(f"SELECT to_regclass('{name}') IS NOT NULL")).scalar()
+        if not exists and has_default:
+            # Build the partition as a plain table holding the month's rows
+            # from DEFAULT, then attach it; DEFAULT no longer overlaps it.
+            # One transaction, so a failure leaves the rows where they were
+            conn.execute(text(
+                f"CREATE TABLE {name} (LIKE query_logs INCLUDING DEFAULTS)"
+            ))
+            conn.execute(text(
+                f"WITH moved AS ("
+                f"DELETE FROM query_logs_default "
+                f"WHERE timestamp >= '{start}' AND timestamp < '{end}' "
+                f"RETURNING id, query_text, language, timestamp) "
+                f"INSERT INTO {name} (id, query_text, language, timestamp) "
+                f"SELECT id, query_text, language, timestamp FROM moved"
+            ))
+            conn.execute(text(
+                f"ALTER TABLE query_logs ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+        elif not exists:
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF query_logs "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+        year, month = next_year, next_month
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS query_logs_default PARTITION OF query_logs DEFAULT"
+    ))
+
+
+@event.listens_for(QueryLog.__table__, "after_create")
+def _create_initial_query_log_partitions(target, connection, **kw):
+    """A partitioned table rejects inserts until it has partitions"""
+    create_query_log_partitions(connection)
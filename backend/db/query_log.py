@@ -0,0 +1,89 @@
+"""
+Query Logging
+Records user queries off the request path, in batched INSERTs
+"""
+
+import atexit
+import threading
+from datetime import datetime
+from queue import Queue, Empty
+
+from sqlalchemy import insert
+
+from backend.core.config import settings
+from backend.core.logging import get_logger
+from backend.db import session as db_session
+from backend.db.models import QueryLog
+
+logger = get_logger()
+
+# Pending QueryLog rows, drained by the writer thread
+_log_queue: "Queue[dict]" = Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def log_query(query_text: str, language: str):
+    """
+    Queue a QueryLog row; returns immediately
+
+    Args:
+        query_text: User query
+        language: Query language code
+    """
+    _ensure_writer()
+    _log_queue.put({
+        "query_text": query_text,
+        "language": language,
+        # Time of the query, not of the (later) batched insert
+        "timestamp": datetime.utcnow(),
+    })
+
+
+def flush():
+    """Block until every queued row has been written (shutdown hook)"""
+    if _writer is not None and _writer.is_alive():
+        _log_queue.join()
+
+
+atexit.register(flush)
+
+
+def _ensure_writer():
+    """Start the writer thread on first use"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(
+                    target=_writer_loop, name="query-log-writer", daemon=True
+                )
+                _writer.start()
+
+
+def _writer_loop():
+    # One long-lived session; it only holds a pooled connection while a
+    # batch is being committed
+    db = db_session.SessionLocal()
+    interval = settings.query_log_flush_interval_ms / 1000
+
+    while True:
+        rows = [_log_queue.get()]
+        try:
+            # Collect more rows until the batch is full or the interval passes
+            while len(rows) < settings.query_log_batch_size:
+                rows.append(_log_queue.get(timeout=interval))
+        except Empty:
+            pass
+
+        try:
+            # Multi-row INSERT ... VALUES (...), (...); ids come from the
+            # column default (uuid7)
+            db.execute(insert(QueryLog), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to write {len(rows)} query logs: {e}")
+        finally:
+            for _ in rows:
+                _log_queue.task_done()
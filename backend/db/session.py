@@ -1,32 +1,100 @@
 import os
+import threading
+import time
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-# Load .env for local / non-Docker runs.
-# On Render (and in docker-compose) the env var is injected by the platform,
-# so load_dotenv() is a no-op — it never overwrites an already-set variable.
-load_dotenv()
+from backend.core.config import settings
+from backend.core.logging import get_logger
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+logger = get_logger()
 
-if not DATABASE_URL:
-    raise RuntimeError(
-        "DATABASE_URL environment variable is not set. "
-        "Set it in Render → Settings → Environment, "
-        "in docker-compose.yml, or in your local .env file."
+# Reentrant: building SessionLocal first builds the engine
+_lock = threading.RLock()
+
+
+def _database_url() -> str:
+    """DATABASE_URL from the environment (or a local .env file)"""
+    # Load .env for local / non-Docker runs.
+    # On Render (and in docker-compose) the env var is injected by the platform,
+    # so load_dotenv() is a no-op — it never overwrites an already-set variable.
+    load_dotenv()
+
+    database_url = os.getenv("DATABASE_URL")
+
+    if not database_url:
+        raise RuntimeError(
+            "DATABASE_URL environment variable is not set. "
+            "Set it in Render → Settings → Environment, "
+            "in docker-compose.yml, or in your local .env file."
+        )
+    return database_url
+
+
+def _build_engine():
+    """Create the pooled engine (first access to session.engine)"""
+    # Explicitly sized QueuePool. Stale connections are retired by age
+    # (pool_recycle) rather than by pinging: pool_pre_ping sends a SELECT 1 on
+    # every checkout, adding a network round-trip to each request. Set
+    # DB_POOL_PRE_PING=true if the database restarts often (e.g. Render's
+    # free tier), so dropped connections are detected before use.
+    # LIFO checkout reuses the most recently returned (warm) connection and
+    # lets surplus ones idle out.
+    engine = create_engine(
+        _database_url(),
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_use_lifo=True,
+    )
+
+    if settings.log_level == "DEBUG":
+        # Per-statement timing, only when debugging
+        @event.listens_for(engine, "before_cursor_execute")
+        def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _log_query_time(conn, cursor, statement, parameters, context, executemany):
+            elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+            logger.debug(f"SQL {elapsed_ms:.1f} ms: {statement[:120]}")
+
+    return engine
+
+
+def _build_session_factory():
+    """Session factory bound to the engine"""
+    return sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=__getattr__("engine"),
     )
 
-# pool_pre_ping=True: before handing a connection from the pool, SQLAlchemy
-# sends a cheap SELECT 1.  If the connection is stale (e.g. Render's Postgres
-# restarted), it is discarded and a fresh one is opened automatically.
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine,
-)
+_LAZY_ATTRIBUTES = {
+    "DATABASE_URL": _database_url,
+    "engine": _build_engine,
+    "SessionLocal": _build_session_factory,
+}
+
+
+def __getattr__(name):
+    """
+    PEP 562 lazy module attributes: DATABASE_URL, engine and SessionLocal
+    are built on first access, so importing models (which only need Base)
+    doesn't parse .env, create an engine or require DATABASE_URL.
+    """
+    builder = _LAZY_ATTRIBUTES.get(name)
+    if builder is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    with _lock:
+        if name not in globals():
+            globals()[name] = builder()
+    return globals()[name]
+
 
 Base = declarative_base()
@@ -0,0 +1,182 @@
+"""
+Embedding Cache
+Content-addressed LRU cache so repeated texts skip the encoder
+"""
+
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single writer process assumed
+    fcntl = None
+
+
+KEY_SIZE = 16  # bytes of the blake2b digest used as cache key
+
+
+class DiskEmbeddingStore:
+    """
+    Append-only on-disk embeddings that survive restarts and re-ingests
+
+    Vectors are float16 rows of a memory-mapped file; a sidecar file holds
+    the dimension followed by one key per row, in row order. Appends take
+    an exclusive file lock so several processes can share one store.
+    """
+
+    def __init__(self, path: str):
+        self.vectors_path = f"{path}.f16"
+        self.keys_path = f"{path}.keys"
+        os.makedirs(os.path.dirname(self.vectors_path) or ".", exist_ok=True)
+        self.dim = None
+        self._rows: Dict[bytes, int] = {}
+        self._keys_offset = 0  # bytes of the keys file already indexed
+        self._vectors = None
+        self._refresh()
+
+    def _refresh(self):
+        """Index keys appended since the last call (possibly by other processes)"""
+        if not os.path.exists(self.keys_path):
+            return
+        with open(self.keys_path, "rb") as f:
+            if self.dim is None:
+                header = f.read(4)
+                if len(header) < 4:
+                    return
+                self.dim = struct.unpack("<I", header)[0]
+                self._keys_offset = 4
+            f.seek(self._keys_offset)
+            data = f.read()
+        count = len(data) // KEY_SIZE
+        first_row = len(self._rows)
+        for i in range(count):
+            self._rows[data[i * KEY_SIZE:(i + 1) * KEY_SIZE]] = first_row + i
+        self._keys_offset += count * KEY_SIZE
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """float32 vectors for stored keys; None marks a miss"""
+        if os.path.exists(self.keys_path) and os.path.getsize(self.keys_path) != self._keys_offset:
+            self._refresh()
+        rows = [self._rows.get(key) for key in keys]
+        if all(row is None for row in rows):
+            return [None] * len(keys)
+
+        if self._vectors is None or len(self._vectors) < len(self._rows):
+            # Map exactly the rows that have keys
+            self._vectors = np.memmap(
+                self.vectors_path, dtype=np.float16, mode="r",
+                shape=(len(self._rows), self.dim)
+            )
+        return [
+            None if row is None else self._vectors[row].astype(np.float32)
+            for row in rows
+        ]
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        """Append vectors for keys not stored yet"""
+        vectors = np.asarray(vectors)
+        with open(self.keys_path, "ab") as keys_file:
+            if fcntl is not None:
+                fcntl.flock(keys_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                if self.dim is None:
+                    self.dim = vectors.shape[1]
+                    keys_file.write(struct.pack("<I", self.dim))
+                    self._keys_offset = 4
+
+                new, seen = [], set()
+                for i, key in enumerate(keys):
+                    if key not in self._rows and key not in seen:
+                        seen.add(key)
+                        new.append(i)
+                if not new:
+                    return
+
+                with open(self.vectors_path, "ab") as vectors_file:
+                    # Drop rows left by an append that crashed before its keys
+                    vectors_file.truncate(len(self._rows) * self.dim * 2)
+                    vectors_file.write(vectors[new].astype(np.float16).tobytes())
+                # Keys last: a row becomes visible only once fully written
+                keys_file.write(b"".join(keys[i] for i in new))
+                keys_file.flush()
+                self._refresh()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(keys_file, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class EmbeddingCache:
+    """
+    In-process LRU cache of embeddings keyed by (model_name, text) digest,
+    optionally backed by a DiskEmbeddingStore that persists across runs
+    Legal corpora repeat boilerplate clauses verbatim, so hits are common
+
+    Only passage embeddings belong on disk: callers pass persistent=False
+    for user queries, which would otherwise grow the store without bound
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 10000, path: str = None):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes disk store access; kept separate from _lock so LRU hits
+        # never wait behind a file lock or append
+        self._disk_lock = threading.Lock()
+        self.disk = DiskEmbeddingStore(path) if path else None
+
+    def key(self, text: str) -> bytes:
+        """Digest of the model name and (prefixed) input text"""
+        return hashlib.blake2b(
+            f"{self.model_name}\0{text}".encode("utf-8"),
+            digest_size=KEY_SIZE
+        ).digest()
+
+    def get_many(self, keys: List[bytes], persistent: bool = True) -> List[Optional[np.ndarray]]:
+        """Look up embeddings; None marks a miss. persistent=False skips the disk store"""
+        results = []
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                results.append(vector)
+
+        misses = [i for i, vector in enumerate(results) if vector is None]
+        if self.disk is not None and persistent and misses:
+            with self._disk_lock:
+                stored = self.disk.get_many([keys[i] for i in misses])
+            with self._lock:
+                for i, vector in zip(misses, stored):
+                    if vector is not None:
+                        results[i] = vector
+                        self._remember(keys[i], vector)
+        return results
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray, persistent: bool = True):
+        """Store embeddings, evicting least recently used entries. persistent=False skips the disk store"""
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+        if self.disk is not None and persistent:
+            with self._disk_lock:
+                self.disk.put_many(keys, vectors)
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        """Insert into the in-memory LRU (lock held)"""
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -3,32 +3,174 @@ Embedding Generation using e5-large-v2
 Generates dense vector representations for semantic search
 """
 
-from typing import List
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Union
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
+from backend.embeddings.cache import EmbeddingCache
 from backend.core.config import settings
 from backend.core.logging import get_logger
 
 logger = get_logger()
 
 
+def _resolve_device(device: str) -> str:
+    """Pick CUDA, then MPS, then CPU when device is 'auto'"""
+    if device and device != "auto":
+        return device
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+class ONNXEncoder:
+    """
+    ONNX Runtime (CPU) encoder for e5 models
+    Mirrors the subset of SentenceTransformer.encode() used by EmbeddingModel
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False, max_length: int = 512):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.max_length = max_length
+
+        model = ORTModelForFeatureExtraction.from_pretrained(
+            model_name,
+            export=True,
+            provider="CPUExecutionProvider"
+        )
+
+        if quantize:
+            from optimum.onnxruntime import ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+            save_dir = Path(settings.embedding_onnx_dir) / model_name.replace("/", "__")
+            quantized_path = save_dir / "model_quantized.onnx"
+
+            if not quantized_path.exists():
+                logger.info(f"Quantizing ONNX model to int8: {save_dir}")
+                model.save_pretrained(save_dir)
+                quantizer = ORTQuantizer.from_pretrained(model)
+                qconfig = AutoQuantizationConfig.avx512_vnni(
+                    is_static=False,
+                    per_channel=False
+                )
+                quantizer.quantize(save_dir=save_dir, quantization_config=qconfig)
+                self.tokenizer.save_pretrained(save_dir)
+
+            model = ORTModelForFeatureExtraction.from_pretrained(
+                save_dir,
+                file_name=quantized_path.name,
+                provider="CPUExecutionProvider"
+            )
+
+        self.model = model
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = True,
+        **kwargs
+    ) -> np.ndarray:
+        """Mean-pooled (and optionally L2-normalized) sentence embeddings"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        # Length-sort so each batch pads to similar lengths
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        pooled = []
+
+        for start in range(0, len(sentences), batch_size):
+            batch = [sentences[i] for i in order[start:start + batch_size]]
+            inputs = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"][..., None].astype(hidden.dtype)
+            summed = (hidden * mask).sum(axis=1)
+            pooled.append(summed / np.clip(mask.sum(axis=1), 1e-9, None))
+
+        embeddings = np.empty((len(sentences), pooled[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(pooled)
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.clip(norms, 1e-12, None)
+
+        return embeddings[0] if single else embeddings
+
+
 class EmbeddingModel:
     """
     Wrapper for e5-large-v2 embedding model
     Uses proper query/passage prefixes for optimal performance
     """
 
-    def __init__(self, model_name: str = None):
+    # Above this many texts, spread encoding over a multi-GPU process pool
+    MULTI_PROCESS_MIN_TEXTS = 256
+
+    def __init__(self, model_name: str = None, batch_size: int = None):
         self.model_name = model_name or settings.embedding_model_name
-        logger.info(f"Loading embedding model: {self.model_name}")
+        self.backend = settings.embedding_backend
+        self.device = (
+            "cpu" if self.backend == "onnx"
+            else _resolve_device(settings.embedding_device)
+        )
+        self.batch_size = (
+            batch_size
+            or settings.embedding_batch_size
+            or (16 if self.device == "cpu" else 64)
+        )
+        self._pool = None
+        self._passage_prefix_ids = None
+        self.cache = (
+            EmbeddingCache(
+                self.model_name,
+                settings.embedding_cache_size,
+                path=self._disk_cache_path()
+            )
+            if settings.embedding_cache_size > 0 else None
+        )
+        logger.info(
+            f"Loading embedding model: {self.model_name} "
+            f"(backend={self.backend}, device={self.device})"
+        )
         
         try:
-            self.model = SentenceTransformer(self.model_name)
+            if self.backend == "onnx":
+                self.model = ONNXEncoder(
+                    self.model_name,
+                    quantize=settings.embedding_onnx_quantize
+                )
+            else:
+                self.model = SentenceTransformer(self.model_name, device=self.device)
+                if self.device == "cuda" and settings.embedding_half_precision:
+                    # fp16 halves weight/activation traffic; e5 outputs are
+                    # L2-normalized so cosine scores are unaffected in practice
+                    self.model.half()
             logger.info("Embedding model loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load embedding model: {e}")
             raise
 
+    def _disk_cache_path(self):
+        """Per-model file prefix of the persistent cache, or None if disabled"""
+        if not settings.embedding_disk_cache_dir:
+            return None
+        return str(Path(settings.embedding_disk_cache_dir) / self.model_name.replace("/", "__"))
+
     def embed_documents(self, texts: List[str]) -> np.ndarray:
         """
         Embed document passages.
@@ -46,16 +188,172 @@ class EmbeddingModel:
         
         # Add passage prefix for e5 models
         prefixed_texts = [f"passage: {text}" for text in texts]
+
+        return self._embed_cached(
+            prefixed_texts,
+            lambda idx: self._encode_passages([prefixed_texts[i] for i in idx])
+        )
+
+    def embed_documents_pretokenized(
+        self,
+        texts: List[str],
+        input_ids: List[List[int]]
+    ) -> np.ndarray:
+        """
+        Embed document passages from token ids produced by LegalChunker.
+        Skips the second tokenization pass; texts are only used as cache keys.
+        
+        Args:
+            texts: Chunk texts (same order as input_ids)
+            input_ids: Token ids per chunk, without special tokens or prefix
         
-        logger.info(f"Embedding {len(texts)} documents")
+        Returns:
+            Normalized embeddings as numpy array
+        """
+        if not texts:
+            logger.warning("Empty text list provided for embedding")
+            return np.array([])
+
+        if self.backend != "torch":
+            return self.embed_documents(texts)
+
+        prefixed_texts = [f"passage: {text}" for text in texts]
+
+        return self._embed_cached(
+            prefixed_texts,
+            lambda idx: self._encode_token_ids([input_ids[i] for i in idx])
+        )
+
+    def embed_chunks(self, chunks: List[Dict]) -> np.ndarray:
+        """Embed chunk dicts, reusing the chunker's token ids when present"""
+        texts = [c["text"] if isinstance(c, dict) else c for c in chunks]
+        input_ids = [c.get("input_ids") if isinstance(c, dict) else None for c in chunks]
+
+        if texts and all(ids is not None for ids in input_ids):
+            return self.embed_documents_pretokenized(texts, input_ids)
+        return self.embed_documents(texts)
+
+    def _embed_cached(
+        self,
+        prefixed_texts: List[str],
+        encode: Callable[[List[int]], np.ndarray],
+        persistent: bool = True
+    ) -> np.ndarray:
+        """
+        Encode only the positions missing from the cache, in input order.
+        persistent=False (queries) keeps results out of the disk store.
+        """
+        if self.cache is None:
+            logger.info(f"Embedding {len(prefixed_texts)} documents")
+            return encode(list(range(len(prefixed_texts))))
+
+        keys = [self.cache.key(t) for t in prefixed_texts]
+        cached = self.cache.get_many(keys, persistent=persistent)
+
+        # Misses grouped by key: a clause repeated within one batch (common
+        # in bulk ingestion of boilerplate-heavy contracts) is encoded once
+        miss_positions: Dict[bytes, List[int]] = {}
+        for i, vector in enumerate(cached):
+            if vector is None:
+                miss_positions.setdefault(keys[i], []).append(i)
+
+        logger.info(
+            f"Embedding {len(prefixed_texts)} documents "
+            f"({len(prefixed_texts) - sum(map(len, miss_positions.values()))} cached, "
+            f"{len(miss_positions)} unique to encode)"
+        )
+
+        if miss_positions:
+            miss_keys = list(miss_positions)
+            fresh = encode([miss_positions[key][0] for key in miss_keys])
+            self.cache.put_many(miss_keys, fresh, persistent=persistent)
+            for key, vector in zip(miss_keys, fresh):
+                for i in miss_positions[key]:
+                    cached[i] = vector
+
+        return np.stack(cached)
+
+    def _encode_passages(self, prefixed_texts: List[str]) -> np.ndarray:
+        """Run the encoder over already-prefixed passages"""
+        if self._use_multi_process(len(prefixed_texts)):
+            if self._pool is None:
+                self._pool = self.model.start_multi_process_pool()
+            embeddings = self.model.encode_multi_process(
+                prefixed_texts,
+                self._pool,
+                batch_size=self.batch_size
+            ).astype(np.float32, copy=False)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            return embeddings / np.clip(norms, 1e-12, None)
+
+        # encode() sorts inputs by length before batching and restores the
+        # original order, so each batch is padded only to similar lengths
         embeddings = self.model.encode(
-            prefixed_texts, 
+            prefixed_texts,
+            batch_size=self.batch_size,
+            device=self.device,
+            convert_to_numpy=True,
             normalize_embeddings=True,
-            show_progress_bar=len(texts) > 10
+            show_progress_bar=len(prefixed_texts) > 10
         )
         
+        # FAISS and pgvector consume float32
+        return embeddings.astype(np.float32, copy=False)
+
+    def _encode_token_ids(self, input_ids: List[List[int]]) -> np.ndarray:
+        """Run the encoder directly on token ids (passage prefix added here)"""
+        tokenizer = self.model.tokenizer
+        if self._passage_prefix_ids is None:
+            self._passage_prefix_ids = tokenizer.encode(
+                "passage: ", add_special_tokens=False
+            )
+
+        max_length = self.model.get_max_seq_length() or tokenizer.model_max_length
+        body_length = max_length - len(self._passage_prefix_ids) - 2  # [CLS], [SEP]
+        sequences = [
+            tokenizer.build_inputs_with_special_tokens(
+                self._passage_prefix_ids + list(ids[:body_length])
+            )
+            for ids in input_ids
+        ]
+
+        # Length-sort so each batch pads to similar lengths
+        order = np.argsort([-len(seq) for seq in sequences], kind="stable")
+        batches = []
+
+        with torch.inference_mode():
+            for start in range(0, len(sequences), self.batch_size):
+                batch = [sequences[i] for i in order[start:start + self.batch_size]]
+                features = tokenizer.pad(
+                    {"input_ids": batch},
+                    padding=True,
+                    return_tensors="pt"
+                )
+                features = {k: v.to(self.device) for k, v in features.items()}
+                vectors = self.model(features)["sentence_embedding"]
+                vectors = torch.nn.functional.normalize(vectors.float(), p=2, dim=1)
+                batches.append(vectors.cpu().numpy())
+
+        embeddings = np.empty(
+            (len(sequences), batches[0].shape[1]), dtype=np.float32
+        )
+        embeddings[order] = np.concatenate(batches)
         return embeddings
 
+    def _use_multi_process(self, n_texts: int) -> bool:
+        """Multi-process encoding only pays off for big batches on several GPUs"""
+        return (
+            self.backend == "torch"
+            and n_texts > self.MULTI_PROCESS_MIN_TEXTS
+            and torch.cuda.device_count() > 1
+        )
+
+    def close(self):
+        """Stop the multi-process pool, if one was started"""
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
     def embed_query(self, query: str) -> np.ndarray:
         """
         Embed user query.
@@ -68,24 +366,58 @@ class EmbeddingModel:
             Normalized query embedding
         """
         logger.info(f"Embedding query: {query[:50]}...")
+
+        prefixed_query = f"query: {query}"
+        if self.cache is not None:
+            key = self.cache.key(prefixed_query)
+            # Queries stay in the in-memory LRU; only passages are persisted
+            cached = self.cache.get_many([key], persistent=False)[0]
+            if cached is not None:
+                return cached.copy()
         
         embedding = self.model.encode(
-            f"query: {query}",
+            prefixed_query,
+            device=self.device,
             normalize_embeddings=True
-        )
+        ).astype(np.float32, copy=False)
+
+        if self.cache is not None:
+            self.cache.put_many([key], [embedding], persistent=False)
+            # The cache holds this array; callers get their own copy
+            return embedding.copy()
         
         return embedding
 
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed several user queries in one encoder batch
+        
+        Args:
+            queries: Search query texts
+        
+        Returns:
+            Normalized query embeddings, one row per query
+        """
+        prefixed_queries = [f"query: {query}" for query in queries]
+        return self._embed_cached(
+            prefixed_queries,
+            lambda idx: self._encode_passages([prefixed_queries[i] for i in idx]),
+            persistent=False
+        )
+
 
 # Global embedder instance (lazy loaded)
 _embedder = None
+_embedder_lock = threading.Lock()
 
 
 def get_embedder() -> EmbeddingModel:
     """Get or create global embedder instance"""
     global _embedder
     if _embedder is None:
-        _embedder = EmbeddingModel()
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = EmbeddingModel()
     return _embedder
 
 
@@ -3,7 +3,10 @@ Universal Document Loaders
 Supports: PDF, DOCX, TXT, and plain text with automatic OCR fallback
 """
 
+import codecs
+import mmap
 import os
+import threading
 from pathlib import Path
 from typing import Union, Dict
 from backend.core.logging import get_logger
@@ -25,15 +28,46 @@ def load_txt(file_path: Union[str, Path]) -> str:
     try:
         logger.info(f"Loading TXT file: {file_path}")
         
-        # Try UTF-8 first
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                text = f.read()
-        except UnicodeDecodeError:
-            # Fallback to latin-1
-            logger.warning(f"UTF-8 failed, trying latin-1 for {file_path}")
-            with open(file_path, "r", encoding="latin-1", errors="ignore") as f:
-                text = f.read()
+        with open(file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            # Decode straight from the page cache (no intermediate bytes copy)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as raw:
+                # Try UTF-8 first
+                try:
+                    text = codecs.decode(raw, "utf-8")
+                except UnicodeDecodeError:
+                    # Fallback: detect encoding over the whole buffer (a
+                    # clean ASCII head says nothing about the rest)
+                    from charset_normalizer import from_bytes
+                    
+                    matches = from_bytes(bytes(raw))
+                    best = matches.best()
+                    # UTF-8 already failed, so some byte is >= 0x80 and ASCII
+                    # is wrong. A few accented bytes in mostly-ASCII text also
+                    # tie across many code pages; prefer cp1252 (the common
+                    # Windows default) unless another one fits strictly better.
+                    encoding = "cp1252"
+                    if best is not None and best.encoding != "ascii":
+                        tied = any(
+                            "cp1252" in m.could_be_from_charset
+                            and m.chaos <= best.chaos
+                            and m.coherence >= best.coherence
+                            for m in matches
+                        )
+                        if not tied:
+                            encoding = best.encoding
+                    logger.warning(f"UTF-8 failed, decoding {file_path} as {encoding}")
+                    text = codecs.decode(raw, encoding, errors="replace")
+                    replaced = text.count("\ufffd")
+                    if replaced:
+                        logger.warning(
+                            f"{replaced} undecodable bytes in {file_path} "
+                            f"replaced with U+FFFD"
+                        )
+        
+        # Match text-mode open(): universal newlines
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
         
         logger.info(f"TXT loaded: {len(text)} characters")
         return text
@@ -59,16 +93,16 @@ def load_docx(file_path: Union[str, Path]) -> str:
         
         doc = Document(file_path)
         
-        # Extract text from all paragraphs
-        paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-        text = "\n".join(paragraphs)
-        
-        # Also extract text from tables
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    if cell.text.strip():
-                        text += "\n" + cell.text
+        # Extract text from all paragraphs, then from tables
+        parts = [p.text for p in doc.paragraphs if p.text.strip()]
+        parts.extend(
+            cell.text
+            for table in doc.tables
+            for row in table.rows
+            for cell in row.cells
+            if cell.text.strip()
+        )
+        text = "\n".join(parts)
         
         logger.info(f"DOCX loaded: {len(text)} characters")
         return text
@@ -95,7 +129,7 @@ def load_pdf(file_path: Union[str, Path], force_ocr: bool = False) -> str:
         Extracted text
     """
     try:
-        import pdfplumber
+        import fitz
         from backend.ingestion.ocr import (
             extract_text_from_pdf_images,
             is_pdf_scanned
@@ -108,15 +142,11 @@ def load_pdf(file_path: Union[str, Path], force_ocr: bool = False) -> str:
             return extract_text_from_pdf_images(file_path)
         
         # Step 1: Try normal text extraction
-        extracted_text = ""
+        with fitz.open(file_path) as pdf:
+            logger.info(f"PDF has {pdf.page_count} pages")
+            page_texts = [page.get_text("text") for page in pdf]
         
-        with pdfplumber.open(file_path) as pdf:
-            logger.info(f"PDF has {len(pdf.pages)} pages")
-            
-            for page_num, page in enumerate(pdf.pages, 1):
-                text = page.extract_text()
-                if text:
-                    extracted_text += text + "\n"
+        extracted_text = "".join(text + "\n" for text in page_texts if text)
         
         # Step 2: Check if text extraction was successful
         char_count = len(extracted_text.strip())
@@ -126,7 +156,7 @@ def load_pdf(file_path: Union[str, Path], force_ocr: bool = False) -> str:
         if char_count < 200:
             logger.info("Insufficient text, checking if PDF is scanned...")
             
-            if is_pdf_scanned(file_path):
+            if is_pdf_scanned(file_path, page_texts=page_texts):
                 logger.info("Scanned PDF detected, using OCR")
                 extracted_text = extract_text_from_pdf_images(file_path)
             else:
@@ -303,11 +333,14 @@ class DocumentLoader:
 
 # Global loader instance
 _loader = None
+_loader_lock = threading.Lock()
 
 
 def get_loader() -> DocumentLoader:
     """Get or create global document loader"""
     global _loader
     if _loader is None:
-        _loader = DocumentLoader()
+        with _loader_lock:
+            if _loader is None:
+                _loader = DocumentLoader()
     return _loader
@@ -3,47 +3,165 @@ OCR Pipeline using Tesseract
 Handles scanned PDFs and image-based documents with preprocessing
 """
 
-import cv2
+import os
+import re
+import threading
 import pytesseract
 import numpy as np
 from PIL import Image
 from pathlib import Path
-from typing import Union
+from typing import Union, Dict, List
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
 from backend.core.config import settings
 from backend.core.logging import get_logger
+from backend.ingestion.otsu import otsu_threshold
+
+try:
+    import cv2
+except ImportError:  # slim containers without OpenCV use the otsu fallback
+    cv2 = None
 
 logger = get_logger()
 
+# Pages are OCR'd on a thread pool, one page per core; Tesseract's own
+# OpenMP threads would oversubscribe the CPU. Must be set before
+# libtesseract is loaded (tesserocr import / pytesseract subprocesses).
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+# Thread-local scratch buffers and tesserocr handles for OCR
+_thread_buffers = threading.local()
+_tesserocr_available = None
+
+
+def _to_grayscale(image: Union[Image.Image, np.ndarray]) -> np.ndarray:
+    """Grayscale uint8 array from a PIL image or a raw pixel array"""
+    if isinstance(image, np.ndarray):
+        if image.ndim == 2:
+            return image
+        if image.shape[2] == 1:
+            return image[:, :, 0]
+        if cv2 is None:
+            # ITU-R 601 luma weights, same as COLOR_RGB2GRAY
+            luma = image[:, :, :3] @ np.array([0.299, 0.587, 0.114])
+            return np.rint(luma).astype(np.uint8)
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    # Convert straight to grayscale in PIL (no intermediate RGB buffer)
+    return np.asarray(image.convert("L"))
+
+
+def render_page_gray(page, resolution: int = 300) -> np.ndarray:
+    """Rasterize a PyMuPDF page straight to a grayscale numpy array"""
+    import fitz
+    
+    pix = page.get_pixmap(dpi=resolution, colorspace=fitz.csGRAY, alpha=False)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(
+        pix.height, pix.width
+    )
+
+
+def _downscale(gray: np.ndarray, max_height: int) -> np.ndarray:
+    """Shrink a page to max_height pixels tall (never upscales)"""
+    height, width = gray.shape
+    if not max_height or height <= max_height:
+        return gray
+    
+    size = (max(1, round(width * max_height / height)), max_height)
+    if cv2 is None:
+        return np.asarray(Image.fromarray(gray).resize(size, Image.BILINEAR))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+
+def _deskew(binary: np.ndarray, min_angle: float = 0.5) -> np.ndarray:
+    """Rotate a binarized page so its text lines are horizontal"""
+    coords = cv2.findNonZero(cv2.bitwise_not(binary))
+    if coords is None:
+        return binary
+    
+    # minAreaRect reports (-90, 0] before OpenCV 4.5.1 and [0, 90) after;
+    # fold either convention into (-45, 45]
+    angle = cv2.minAreaRect(coords)[-1]
+    if angle > 45:
+        angle -= 90
+    elif angle <= -45:
+        angle += 90
+    if abs(angle) < min_angle:
+        return binary
+    
+    height, width = binary.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        binary,
+        matrix,
+        (width, height),
+        flags=cv2.INTER_NEAREST,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=255
+    )
+
+
+def _thresh_buffer(shape) -> np.ndarray:
+    """Per-thread reusable uint8 buffer for threshold output"""
+    buf = getattr(_thread_buffers, "thresh", None)
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, dtype=np.uint8)
+        _thread_buffers.thresh = buf
+    return buf
 
-def preprocess_image(image: Image.Image) -> np.ndarray:
+
+def preprocess_image(
+    image: Union[Image.Image, np.ndarray],
+    out: np.ndarray = None
+) -> np.ndarray:
     """
     Improve OCR accuracy for scanned legal documents
     
     Preprocessing steps:
     1. Convert to grayscale
-    2. Apply Otsu's thresholding
-    3. Denoise (optional)
+    2. Downscale to settings.ocr_max_height (Tesseract time scales with pixels)
+    3. Binarize (adaptive Gaussian, or Otsu without OpenCV)
+    4. Deskew
+    5. Denoise (optional)
     
     Args:
-        image: PIL Image object
+        image: PIL Image or numpy array (grayscale or RGB)
+        out: Optional uint8 buffer (same shape as the resized page) to
+            write into
     
     Returns:
         Preprocessed numpy array optimized for OCR
     """
     try:
-        # Convert PIL Image to numpy array
-        img = np.array(image.convert("RGB"))
+        gray = _downscale(_to_grayscale(image), settings.ocr_max_height)
+        
+        if out is not None and out.shape != gray.shape:
+            out = None
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        # Adaptive thresholding copes with uneven lighting and shadows
+        # from phone-camera scans; Otsu is the global fallback
+        if cv2 is None:
+            thresh = otsu_threshold(gray, out=out)
+        elif settings.ocr_binarization == "adaptive":
+            thresh = cv2.adaptiveThreshold(
+                gray,
+                255,
+                cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                cv2.THRESH_BINARY,
+                31,
+                10,
+                dst=out
+            )
+        else:
+            thresh = cv2.threshold(
+                gray, 
+                0, 
+                255,
+                cv2.THRESH_BINARY + cv2.THRESH_OTSU,
+                dst=out
+            )[1]
         
-        # Apply Otsu's thresholding for better text contrast
-        thresh = cv2.threshold(
-            gray, 
-            0, 
-            255,
-            cv2.THRESH_BINARY + cv2.THRESH_OTSU
-        )[1]
+        if settings.ocr_deskew and cv2 is not None:
+            thresh = _deskew(thresh)
         
         # Optional: Denoise (can improve accuracy for noisy scans)
         # denoised = cv2.fastNlMeansDenoising(thresh, None, 10, 7, 21)
@@ -54,15 +172,66 @@ def preprocess_image(image: Image.Image) -> np.ndarray:
     except Exception as e:
         logger.error(f"Image preprocessing failed: {e}")
         # Return original as grayscale fallback
-        return np.array(image.convert("L"))
+        return _to_grayscale(image)
+
+
+def _parse_tesseract_config(config: str):
+    """Split a Tesseract CLI config string into (psm, oem, variables)"""
+    psm = re.search(r"--psm\s+(\d+)", config)
+    oem = re.search(r"--oem\s+(\d+)", config)
+    variables = dict(re.findall(r"-c\s+(\w+)=(\S+)", config))
+    return (
+        int(psm.group(1)) if psm else 3,
+        int(oem.group(1)) if oem else 3,
+        variables
+    )
+
+
+def _get_tess_api(lang: str):
+    """
+    Per-thread tesserocr handle (libtesseract in-process), or None if
+    tesserocr is not installed. Avoids a tesseract subprocess per page.
+    """
+    global _tesserocr_available
+    if _tesserocr_available is False:
+        return None
+    
+    apis = getattr(_thread_buffers, "tess_apis", None)
+    if apis is None:
+        apis = _thread_buffers.tess_apis = {}
+    if lang in apis:
+        return apis[lang]
+    
+    try:
+        import tesserocr
+    except ImportError:
+        _tesserocr_available = False
+        logger.info("tesserocr not installed, using pytesseract subprocess")
+        return None
+    _tesserocr_available = True
+    
+    psm, oem, variables = _parse_tesseract_config(settings.tesseract_config)
+    api = tesserocr.PyTessBaseAPI(
+        lang=lang,
+        psm=tesserocr.PSM(psm),
+        oem=tesserocr.OEM(oem)
+    )
+    for name, value in variables.items():
+        api.SetVariable(name, value)
+    
+    apis[lang] = api
+    return api
 
 
-def extract_text_from_image(image: Image.Image, lang: str = None) -> str:
+def extract_text_from_image(
+    image: Union[Image.Image, np.ndarray],
+    lang: str = None
+) -> str:
     """
     Extract text from image using Tesseract OCR
     
     Args:
-        image: PIL Image object
+        image: PIL Image object or numpy pixel array
         lang: Language code for OCR (default: eng+hin for English+Hindi)
     
     Returns:
@@ -73,15 +242,22 @@ def extract_text_from_image(image: Image.Image, lang: str = None) -> str:
         
         logger.info(f"Extracting text with OCR (lang={lang})")
         
-        # Preprocess image for better OCR
-        processed_img = preprocess_image(image)
+        # Preprocess image for better OCR, reusing this thread's buffer
+        # (Tesseract consumes it before the call returns)
+        gray = _downscale(_to_grayscale(image), settings.ocr_max_height)
+        processed_img = preprocess_image(gray, out=_thresh_buffer(gray.shape))
         
-        # Perform OCR
-        text = pytesseract.image_to_string(
-            processed_img,
-            lang=lang,
-            config='--psm 3'  # Fully automatic page segmentation
-        )
+        # Perform OCR (in-process via tesserocr when available)
+        api = _get_tess_api(lang)
+        if api is not None:
+            api.SetImage(Image.fromarray(processed_img))
+            text = api.GetUTF8Text()
+        else:
+            text = pytesseract.image_to_string(
+                processed_img,
+                lang=lang,
+                config=settings.tesseract_config
+            )
         
         logger.info(f"OCR extracted {len(text)} characters")
         return text
@@ -97,47 +273,96 @@ def extract_text_from_image(image: Image.Image, lang: str = None) -> str:
         return ""
 
 
-def extract_text_from_pdf_images(pdf_path: Union[str, Path], resolution: int = 300) -> str:
+def ocr_pages(
+    images: List[Union[Image.Image, np.ndarray]],
+    lang: str = None
+) -> List[str]:
+    """
+    OCR a batch of page images on the calling thread, reusing its
+    Tesseract handle (model loaded once, SetImage per page)
+    
+    Args:
+        images: Page images (PIL or numpy pixel arrays)
+        lang: Tesseract language code (default: settings.tesseract_lang)
+    
+    Returns:
+        Extracted text per page, in input order
+    """
+    return [extract_text_from_image(image, lang) for image in images]
+
+
+def extract_text_from_pdf_images(
+    pdf_path: Union[str, Path],
+    resolution: int = 300,
+    lang: str = None,
+    max_workers: int = None
+) -> str:
     """
     Extract text from scanned PDF using OCR
     
+    Pages are rasterized with PyMuPDF directly into grayscale numpy arrays
+    on the calling thread (MuPDF is not thread-safe) and OCR'd on a thread
+    pool; Tesseract runs outside the GIL, so rasterizing page N+1 overlaps
+    with OCR of page N.
+    
     Args:
         pdf_path: Path to PDF file
         resolution: DPI resolution for image conversion (higher = better quality)
+        lang: Tesseract language code (default: settings.tesseract_lang)
+        max_workers: OCR threads (default: CPU count)
     
     Returns:
         Extracted text from all pages
     """
     try:
-        import pdfplumber
+        import fitz
         
         logger.info(f"Processing scanned PDF with OCR: {pdf_path}")
         
-        full_text = ""
-        page_count = 0
+        max_workers = max_workers or os.cpu_count() or 1
+        page_texts: Dict[int, str] = {}
         
-        with pdfplumber.open(pdf_path) as pdf:
-            total_pages = len(pdf.pages)
+        with fitz.open(pdf_path) as pdf, \
+                ThreadPoolExecutor(max_workers=max_workers) as executor:
+            total_pages = pdf.page_count
+            pending = {}
             
-            for page_num, page in enumerate(pdf.pages, 1):
+            def collect(done):
+                for future in done:
+                    page_num = pending.pop(future)
+                    try:
+                        page_texts[page_num] = future.result()
+                    except Exception as e:
+                        logger.warning(f"Failed to OCR page {page_num}: {e}")
+            
+            for page_num, page in enumerate(pdf, 1):
                 logger.info(f"OCR processing page {page_num}/{total_pages}")
                 
                 try:
                     # Convert page to image at specified resolution
-                    image = page.to_image(resolution=resolution).original
-                    
-                    # Extract text with OCR
-                    page_text = extract_text_from_image(image)
-                    
-                    if page_text.strip():
-                        full_text += f"\n--- Page {page_num} ---\n{page_text}\n"
-                        page_count += 1
-                    
+                    image = render_page_gray(page, resolution)
                 except Exception as e:
-                    logger.warning(f"Failed to OCR page {page_num}: {e}")
+                    logger.warning(f"Failed to rasterize page {page_num}: {e}")
                     continue
+                
+                pending[executor.submit(extract_text_from_image, image, lang)] = page_num
+                
+                # Bound the number of page images held in memory
+                if len(pending) >= 2 * max_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            
+            collect(list(pending))
+        
+        # Reassemble in page order
+        parts = [
+            f"\n--- Page {page_num} ---\n{page_texts[page_num]}\n"
+            for page_num in sorted(page_texts)
+            if page_texts[page_num].strip()
+        ]
+        full_text = "".join(parts)
         
-        logger.info(f"OCR completed for {page_count}/{total_pages} pages")
+        logger.info(f"OCR completed for {len(parts)}/{total_pages} pages")
         return full_text
         
     except Exception as e:
@@ -145,42 +370,48 @@ def extract_text_from_pdf_images(pdf_path: Union[str, Path], resolution: int = 3
         raise
 
 
-def is_pdf_scanned(pdf_path: Union[str, Path], sample_pages: int = 3) -> bool:
+def is_pdf_scanned(
+    pdf_path: Union[str, Path],
+    sample_pages: int = 3,
+    page_texts: List[str] = None
+) -> bool:
     """
     Heuristic to detect if a PDF is scanned (image-based)
     
     Args:
         pdf_path: Path to PDF file
         sample_pages: Number of pages to sample for detection
+        page_texts: Already-extracted per-page text; skips reopening the PDF
     
     Returns:
         True if PDF appears to be scanned
     """
     try:
-        import pdfplumber
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            total_chars = 0
-            pages_checked = 0
-            
-            # Check first few pages
-            for page in pdf.pages[:sample_pages]:
-                text = page.extract_text()
-                if text:
-                    total_chars += len(text.strip())
-                pages_checked += 1
-            
-            # Heuristic: If very little text per page, likely scanned
-            avg_chars_per_page = total_chars / max(pages_checked, 1)
-            
-            is_scanned = avg_chars_per_page < 100
-            
-            logger.info(
-                f"PDF scan detection: avg {avg_chars_per_page:.0f} chars/page "
-                f"-> {'SCANNED' if is_scanned else 'TEXT-BASED'}"
-            )
+        if page_texts is None:
+            import fitz
             
-            return is_scanned
+            with fitz.open(pdf_path) as pdf:
+                page_texts = [
+                    page.get_text("text")
+                    for page in pdf.pages(0, min(sample_pages, pdf.page_count))
+                ]
+        
+        # Check first few pages
+        sampled = page_texts[:sample_pages]
+        total_chars = sum(len(text.strip()) for text in sampled if text)
+        pages_checked = len(sampled)
+        
+        # Heuristic: If very little text per page, likely scanned
+        avg_chars_per_page = total_chars / max(pages_checked, 1)
+        
+        is_scanned = avg_chars_per_page < 100
+        
+        logger.info(
+            f"PDF scan detection: avg {avg_chars_per_page:.0f} chars/page "
+            f"-> {'SCANNED' if is_scanned else 'TEXT-BASED'}"
+        )
+        
+        return is_scanned
             
     except Exception as e:
         logger.warning(f"Scan detection failed: {e}, assuming scanned")
@@ -214,16 +445,23 @@ class OCRProcessor:
     
     def process_scanned_pdf(self, pdf_path: Union[str, Path]) -> str:
         """Process scanned PDF"""
-        return extract_text_from_pdf_images(pdf_path, resolution=self.resolution)
+        return extract_text_from_pdf_images(
+            pdf_path,
+            resolution=self.resolution,
+            lang=self.lang
+        )
 
 
 # Global OCR processor instance
 _ocr_processor = None
+_ocr_processor_lock = threading.Lock()
 
 
 def get_ocr_processor() -> OCRProcessor:
     """Get or create global OCR processor"""
     global _ocr_processor
     if _ocr_processor is None:
-        _ocr_processor = OCRProcessor()
+        with _ocr_processor_lock:
+            if _ocr_processor is None:
+                _ocr_processor = OCRProcessor()
     return _ocr_processor
@@ -0,0 +1,98 @@
+"""
+Otsu Thresholding Fallback
+Binarization for slim deployments without OpenCV; Numba-compiled when available
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # pure NumPy fallback below
+    njit = None
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _histogram(flat):
+        # Serial: indexed increments would race under prange
+        hist = np.zeros(256, np.int64)
+        for i in range(flat.size):
+            hist[flat[i]] += 1
+        return hist
+
+    @njit(cache=True)
+    def _otsu_level(hist):
+        total = hist.sum()
+        sum_all = 0.0
+        for i in range(256):
+            sum_all += i * hist[i]
+
+        weight_bg = 0
+        sum_bg = 0.0
+        best_var = 0.0
+        level = 0
+        for t in range(256):
+            weight_bg += hist[t]
+            if weight_bg == 0:
+                continue
+            weight_fg = total - weight_bg
+            if weight_fg == 0:
+                break
+            sum_bg += t * hist[t]
+            mean_bg = sum_bg / weight_bg
+            mean_fg = (sum_all - sum_bg) / weight_fg
+            between_var = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+            if between_var > best_var:
+                best_var = between_var
+                level = t
+        return level
+
+    @njit(parallel=True, cache=True)
+    def _apply_threshold(flat, level, out):
+        for i in prange(flat.size):
+            out[i] = 255 if flat[i] > level else 0
+
+
+def _otsu_level_numpy(hist: np.ndarray) -> int:
+    """Vectorized Otsu level from a 256-bin histogram"""
+    levels = np.arange(256, dtype=np.float64)
+    weight_bg = np.cumsum(hist).astype(np.float64)
+    weight_fg = weight_bg[-1] - weight_bg
+    sum_bg = np.cumsum(hist * levels)
+    sum_all = sum_bg[-1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between_var = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+
+    between_var[~np.isfinite(between_var)] = 0.0
+    return int(np.argmax(between_var))
+
+
+def otsu_threshold(gray: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """
+    Otsu binarization equivalent to
+    cv2.threshold(gray, 0, 255, THRESH_BINARY + THRESH_OTSU)[1]
+
+    Args:
+        gray: 2-D uint8 grayscale image
+        out: Optional uint8 buffer of the same shape to write into
+
+    Returns:
+        Binary uint8 image (0 / 255)
+    """
+    gray = np.ascontiguousarray(gray, dtype=np.uint8)
+    if out is None or out.shape != gray.shape:
+        out = np.empty_like(gray)
+
+    flat = gray.ravel()
+    if njit is not None:
+        level = _otsu_level(_histogram(flat))
+        _apply_threshold(flat, level, out.reshape(-1))
+    else:
+        level = _otsu_level_numpy(np.bincount(flat, minlength=256))
+        np.copyto(out, np.where(gray > level, 255, 0).astype(np.uint8))
+
+    return out
@@ -3,13 +3,140 @@ Legal Text Preprocessing
 Cleans and normalizes legal documents while preserving structure
 """
 
+import os
 import re
-from typing import Tuple, Dict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import Tuple, Dict, List
 from langdetect import detect, LangDetectException
+from langdetect import detector_factory
 from backend.core.logging import get_logger
 
 logger = get_logger()
 
+# Only the languages detect_language can return
+_DETECTION_LANGUAGES = ("en", "hi")
+
+# Any non-ASCII character; pure-ASCII text cannot be Hindi
+_ASCII_RE = re.compile(r"[^\x00-\x7F]")
+_ASCII_SCAN_CHARS = 2048
+
+# Detection runs on (and is cached by) this leading sample of the text
+_DETECT_SAMPLE_CHARS = 4096
+
+
+def _init_language_profiles():
+    """
+    Eagerly build langdetect's shared factory with just the en/hi profiles
+    
+    langdetect otherwise loads all ~55 profiles on first detect() in every
+    process. Installing the factory up front makes init_factory() a no-op,
+    and seeding makes detection deterministic.
+    """
+    if detector_factory._factory is not None:
+        return
+    
+    try:
+        profiles = []
+        for lang in _DETECTION_LANGUAGES:
+            path = os.path.join(detector_factory.PROFILES_DIRECTORY, lang)
+            with open(path, "r", encoding="utf-8") as f:
+                profiles.append(f.read())
+        
+        factory = detector_factory.DetectorFactory()
+        factory.load_json_profile(profiles)
+        detector_factory.DetectorFactory.seed = 0
+        detector_factory._factory = factory
+    except Exception as e:
+        logger.warning(f"Could not preload language profiles: {e}")
+
+
+_init_language_profiles()
+
+
+@lru_cache(maxsize=1024)
+def _detect_cached(sample: str) -> str:
+    """langdetect on a text sample; seeded, so safe to memoize"""
+    return detect(sample)
+
+# Cleaning patterns use stdlib re on purpose: they rely on lookarounds and
+# Unicode \w/\s/\d (Devanagari text), which RE2/Hyperscan lack or treat
+# as ASCII, and the google-re2 wrapper's sub() is an order of magnitude
+# slower than re on non-ASCII text because of offset translation.
+
+# Header/footer noise lines: "Page N", "N of M", standalone numbers,
+# punctuation-only lines and "---" separators are dropped with their
+# newline; whitespace-only lines are blanked. [^\S\n] is horizontal
+# whitespace, so no alternative can run across a line break.
+_NOISE_LINE_RE = re.compile(
+    r"^[^\S\n]+$"
+    r"|^[^\S\n]*"
+    r"(?:page[^\S\n]*\d+"
+    r"|(?:page[^\S\n]+)?\d+[^\S\n]+of[^\S\n]+\d+"
+    r"|\d+"
+    r"|(?:[^\w\s]|_)(?:[^\w\n]|_)*)"
+    r"[^\S\n]*(?:\n|\Z)",
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Whitespace
+# Runs of spaces/tabs other than a lone space (never crosses a line break).
+# Single spaces between words are left unmatched instead of being
+# rewritten to themselves, which was one match and copy per word.
+_INLINE_SPACE_RE = re.compile(r" [ \t]+|\t[ \t]*")
+_MULTI_NL_RE = re.compile(r"\n{3,}")
+
+# Legal structure, one alternation scanned once. Alternatives only consume
+# what they rewrite (numbers are left to the lookaheads), so "Section 4.Foo"
+# or "Sec. 4.Foo" still get the "4. Foo" fix in the same pass. There is no
+# lookbehind: whether a heading already starts a line is checked by the
+# caller against the emitted text.
+_LEGAL_RE = re.compile(
+    r"(?P<numdot>\d+\.)\s*(?=[A-Za-z])"
+    r"|(?P<heading>(?i:Section|Clause|Article))(?=\s+\d)"
+    r"|(?P<sec>\bSec\.)\s*(?=\d)"
+    r"|(?P<art>\bArt\.)\s*(?=\d)"
+)
+# Line break inserted before each heading, keyed by its first letter
+_LEGAL_BREAKS = {"s": "\n\n", "c": "\n", "a": "\n"}
+
+# Hindi headings: धारा (section), अनुच्छेद (article), खंड (clause). The
+# lookbehind also rejects a preceding Devanagari character, so "उपधारा 3"
+# (sub-section) is not split mid-word. \d covers Devanagari digits too.
+_HI_LEGAL_RE = re.compile(r"(?<![\n\u0900-\u097F])(धारा|अनुच्छेद|खंड)(?=\s+\d)")
+_HI_LEGAL_BREAKS = {"धारा": "\n\n", "अनुच्छेद": "\n", "खंड": "\n"}
+
+# Boilerplate
+_BOILERPLATE_RES = [
+    re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in (
+        r"This document is for informational purposes only.*?\.",
+        r"Confidential and Proprietary.*?\.",
+        r"All rights reserved.*?\.",
+    )
+]
+_AGGRESSIVE_BOILERPLATE_RES = [
+    re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in (
+        r"Copyright \d{4}.*?\.",
+        r"Printed on.*?\.",
+    )
+]
+
+# Common OCR mistakes for legal terms. Only a lone "l"/"0" next to a
+# capitalised word is rewritten, so "1 litre" or "Rs. 10 lakh" are left alone.
+# Every alternative starts with its literal so the scan only stops at
+# "l"/"0"; the word-boundary checks are lookbehinds after it.
+_OCR_RE = re.compile(
+    r"(?P<lead>l)(?<!\w.)(?=\s+[A-Z])"     # "l Court" → "I Court"
+    r"|(?P<trail>l)(?<=[A-Z]\sl)\b"        # "AND l" → "AND I"
+    r"|(?P<zero>0)(?<!\w.)(?=\s+[A-Z])"    # "0 Court" → "O Court"
+)
+_OCR_REPLACEMENTS = {"lead": "I", "trail": "I", "zero": "O"}
+
+
+def _fix_ocr_match(match: re.Match) -> str:
+    """Replacement for whichever _OCR_RE alternative matched"""
+    return _OCR_REPLACEMENTS[match.lastgroup]
+
 
 def detect_language(text: str) -> str:
     """
@@ -28,7 +155,12 @@ def detect_language(text: str) -> str:
             logger.warning("Text too short for reliable language detection")
             return "en"
         
-        lang = detect(text)
+        # Fast path: ASCII-only prefix means English, skip n-gram scoring
+        if _ASCII_RE.search(text, 0, _ASCII_SCAN_CHARS) is None:
+            logger.info("Detected language: en (ASCII fast path)")
+            return "en"
+        
+        lang = _detect_cached(text[:_DETECT_SAMPLE_CHARS])
         
         logger.info(f"Detected language: {lang}")
         
@@ -63,46 +195,8 @@ def remove_headers_and_footers(text: str) -> str:
     Returns:
         Cleaned text
     """
-    lines = text.splitlines()
-    cleaned_lines = []
-    
-    for line in lines:
-        line_stripped = line.strip()
-        
-        # Skip empty lines (will be normalized later)
-        if not line_stripped:
-            cleaned_lines.append("")
-            continue
-        
-        # Remove page numbers
-        if re.match(r"^page\s*\d+$", line_stripped, re.IGNORECASE):
-            logger.debug(f"Removed page number: {line_stripped}")
-            continue
-        
-        # Remove "Page X of Y" patterns
-        if re.match(r"^(page\s+)?\d+\s+of\s+\d+$", line_stripped, re.IGNORECASE):
-            logger.debug(f"Removed page indicator: {line_stripped}")
-            continue
-        
-        # Remove standalone numbers (likely page numbers)
-        if re.match(r"^\d+$", line_stripped):
-            logger.debug(f"Removed standalone number: {line_stripped}")
-            continue
-        
-        # Remove lines with only punctuation/special characters
-        if re.match(r"^[\W_]+$", line_stripped):
-            logger.debug(f"Removed punctuation-only line: {line_stripped}")
-            continue
-        
-        # Remove common OCR artifacts
-        if re.match(r"^-{3,}$", line_stripped):  # "---" separators
-            logger.debug("Removed separator line")
-            continue
-        
-        cleaned_lines.append(line)
-    
-    result = "\n".join(cleaned_lines)
-    logger.info(f"Headers/footers removed: {len(lines)} → {len(cleaned_lines)} lines")
+    result, removed = _NOISE_LINE_RE.subn("", text)
+    logger.info(f"Headers/footers removed: {removed} noise/blank lines cleaned")
     
     return result
 
@@ -121,16 +215,11 @@ def normalize_whitespace(text: str) -> str:
     Returns:
         Normalized text
     """
-    # Replace tabs with spaces
-    text = text.replace("\t", " ")
-    
-    # Replace multiple spaces with one (but not across lines)
-    lines = text.splitlines()
-    normalized_lines = [re.sub(r"[ ]+", " ", line) for line in lines]
-    text = "\n".join(normalized_lines)
+    # Collapse runs of spaces/tabs to one space (but not across lines)
+    text = _INLINE_SPACE_RE.sub(" ", text)
     
     # Normalize multiple newlines (max 2 for paragraph separation)
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _MULTI_NL_RE.sub("\n\n", text)
     
     # Remove trailing/leading whitespace
     text = text.strip()
@@ -139,36 +228,62 @@ def normalize_whitespace(text: str) -> str:
     return text
 
 
-def preserve_legal_structure(text: str) -> str:
+def preserve_legal_structure(text: str, language: str = "en") -> str:
     """
     Preserve and enhance legal document structure:
     - Section markers
     - Clause numbering
     - Article references
     
+    The English rules only match English keywords, so Hindi text gets a
+    Devanagari heading pass instead and other languages are left as-is.
+    
     Args:
         text: Input text
+        language: Detected document language ('en' or 'hi')
     
     Returns:
         Structurally enhanced text
     """
-    # Ensure space after section numbers (e.g., "1.Text" → "1. Text")
-    text = re.sub(r"(\d+\.)\s*([A-Za-z])", r"\1 \2", text)
-    
-    # Add line break before "Section X" (case-insensitive)
-    text = re.sub(r"(?<!\n)(Section\s+\d+)", r"\n\n\1", text, flags=re.IGNORECASE)
-    
-    # Add line break before "Clause X"
-    text = re.sub(r"(?<!\n)(Clause\s+\d+)", r"\n\1", text, flags=re.IGNORECASE)
-    
-    # Add line break before "Article X"
-    text = re.sub(r"(?<!\n)(Article\s+\d+)", r"\n\1", text, flags=re.IGNORECASE)
-    
-    # Normalize "Sec." to "Section" for consistency
-    text = re.sub(r"\bSec\.\s*(\d+)", r"Section \1", text)
+    if language == "hi":
+        text = _HI_LEGAL_RE.sub(
+            lambda m: _HI_LEGAL_BREAKS[m.group(1)] + m.group(1), text
+        )
+        logger.info("Legal structure preserved and enhanced (hi)")
+        return text
+    if language != "en":
+        return text
+    
+    parts = []
+    pos = 0
+    
+    for match in _LEGAL_RE.finditer(text):
+        start = match.start()
+        kind = match.lastgroup
+        parts.append(text[pos:start])
+        
+        if kind == "numdot":
+            # Ensure space after section numbers (e.g., "1.Text" → "1. Text")
+            parts.append(match.group("numdot") + " ")
+        elif kind == "sec":
+            # Normalize "Sec." to "Section" for consistency
+            parts.append("Section ")
+        elif kind == "art":
+            # Normalize "Art." to "Article"
+            parts.append("Article ")
+        else:
+            # Line break before "Section X" / "Clause X" / "Article X".
+            # A match right after a rewrite never follows a newline.
+            heading = match.group("heading")
+            after_newline = start > pos and text[start - 1] == "\n"
+            if not after_newline:
+                parts.append(_LEGAL_BREAKS[heading[0].lower()])
+            parts.append(heading)
+        
+        pos = match.end()
     
-    # Normalize "Art." to "Article"
-    text = re.sub(r"\bArt\.\s*(\d+)", r"Article \1", text)
+    parts.append(text[pos:])
+    text = "".join(parts)
     
     logger.info("Legal structure preserved and enhanced")
     return text
@@ -185,21 +300,14 @@ def remove_boilerplate(text: str, aggressive: bool = False) -> str:
     Returns:
         Text with boilerplate removed
     """
-    boilerplate_patterns = [
-        r"This document is for informational purposes only.*?\.",
-        r"Confidential and Proprietary.*?\.",
-        r"All rights reserved.*?\.",
-    ]
+    boilerplate_patterns = list(_BOILERPLATE_RES)
     
     if aggressive:
         # Add more aggressive patterns
-        boilerplate_patterns.extend([
-            r"Copyright \d{4}.*?\.",
-            r"Printed on.*?\.",
-        ])
+        boilerplate_patterns.extend(_AGGRESSIVE_BOILERPLATE_RES)
     
     for pattern in boilerplate_patterns:
-        text = re.sub(pattern, "", text, flags=re.IGNORECASE | re.DOTALL)
+        text = pattern.sub("", text)
     
     logger.info(f"Boilerplate removed (aggressive={aggressive})")
     return text
@@ -218,15 +326,8 @@ def clean_ocr_artifacts(text: str) -> str:
     # Remove null bytes
     text = text.replace('\x00', '')
     
-    # Fix common OCR mistakes for legal terms
-    ocr_fixes = {
-        r'\bl\s+(\w+)': r'I \1',  # "l" → "I" at word start
-        r'(\w+)\s+l\b': r'\1 I',  # "l" → "I" at word end
-        r'\b0\s+': r'O ',         # "0" → "O" in words
-    }
-    
-    for pattern, replacement in ocr_fixes.items():
-        text = re.sub(pattern, replacement, text)
+    # Fix common OCR mistakes for legal terms (single pass)
+    text = _OCR_RE.sub(_fix_ocr_match, text)
     
     logger.debug("OCR artifacts cleaned")
     return text
@@ -282,7 +383,7 @@ def preprocess_document(
     text = normalize_whitespace(text)
     
     # Step 6: Preserve legal structure
-    text = preserve_legal_structure(text)
+    text = preserve_legal_structure(text, language)
     
     # Update metadata
     updated_metadata = metadata.copy()
@@ -299,6 +400,59 @@ def preprocess_document(
     return text, updated_metadata
 
 
+def _preprocess_one(
+    document: Tuple[str, Dict],
+    remove_boilerplate_text: bool = False,
+    aggressive: bool = False
+) -> Tuple[str, Dict]:
+    """Process-pool entry point (module level so it can be pickled)"""
+    raw_text, metadata = document
+    return preprocess_document(
+        raw_text,
+        metadata,
+        remove_boilerplate_text=remove_boilerplate_text,
+        aggressive=aggressive
+    )
+
+
+def preprocess_batch(
+    documents: List[Tuple[str, Dict]],
+    workers: int = None,
+    remove_boilerplate_text: bool = False,
+    aggressive: bool = False
+) -> List[Tuple[str, Dict]]:
+    """
+    Preprocess many documents across CPU cores
+    
+    preprocess_document is pure and CPU-bound (regex + langdetect), so
+    documents are spread over a process pool to sidestep the GIL. Each
+    worker preloads only the en/hi language profiles on import.
+    
+    Args:
+        documents: List of (raw_text, metadata) tuples
+        workers: Number of processes (default: CPU count)
+        remove_boilerplate_text: Whether to remove boilerplate
+        aggressive: Use aggressive cleaning
+    
+    Returns:
+        List of (cleaned_text, enriched_metadata) in input order
+    """
+    process = partial(
+        _preprocess_one,
+        remove_boilerplate_text=remove_boilerplate_text,
+        aggressive=aggressive
+    )
+    workers = min(workers or os.cpu_count() or 1, len(documents))
+    
+    # Not worth spawning processes for a single document
+    if workers <= 1:
+        return [process(document) for document in documents]
+    
+    logger.info(f"Preprocessing {len(documents)} documents on {workers} processes")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(process, documents, chunksize=8))
+
+
 class TextPreprocessor:
     """
     Configurable text preprocessor for legal documents
@@ -3,9 +3,23 @@ FastAPI Main Entry Point
 This will be implemented in Phase 2
 """
 
+import sys
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from backend.core.config import settings
+from backend.core.logging import setup_logging
+from backend.multilingual import detector
+
+# Models are loaded at import, not per worker: under gunicorn with
+# preload_app = True (or --preload) this runs once in the master and the
+# forked workers share the pages copy-on-write.
+detector.preload()
+if settings.enable_translation and settings.preload_translation_model:
+    from backend.multilingual.translator import get_translator
+    get_translator()
+
 # Placeholder for future implementation
 app = FastAPI(
     title="NyaaSahayak API",
@@ -37,6 +51,30 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.on_event("startup")
+def configure_logging():
+    """Install console/file log handlers once per worker process"""
+    setup_logging()
+
+
+@app.on_event("shutdown")
+def flush_vector_indexes():
+    """Join FAISS background writers and flush pending index saves"""
+    # Only if a store was ever loaded; importing it here would pull in
+    # the embedding model and database
+    faiss_store = sys.modules.get("backend.vectorstore.faiss_store")
+    if faiss_store is not None:
+        faiss_store.close_all_stores()
+
+
+@app.on_event("shutdown")
+def flush_query_logs():
+    """Write query logs still queued for the background writer"""
+    query_log = sys.modules.get("backend.db.query_log")
+    if query_log is not None:
+        query_log.flush()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,13 +1,189 @@
 """
 Language Detection
 Detects input language (English/Hindi)
+
+Pure-script text is decided by a codepoint scan (Devanagari vs ASCII);
+mixed text uses fastText's lid.176 model (C++, microseconds per call) when
+available, falling back to langdetect otherwise.
 """
 
-from langdetect import detect, LangDetectException
+import os
+import threading
+from typing import List, Optional
+import numpy as np
+from langdetect import detect, DetectorFactory, LangDetectException
+from langdetect.detector_factory import init_factory
+from backend.core.config import settings
 from backend.core.logging import get_logger
 
+try:
+    from numba import njit
+except ImportError:  # NumPy masks below
+    njit = None
+
 logger = get_logger()
 
+# fastText model: None = not loaded yet, False = unavailable (use langdetect)
+_fasttext_model = None
+_fasttext_lock = threading.Lock()
+
+_FASTTEXT_LABEL_PREFIX = "__label__"
+
+# Codepoint-scan thresholds (share of all characters in the text)
+_DEVANAGARI_MIN_SHARE = 0.3
+_ASCII_MIN_SHARE = 0.95
+# Above this length the scan runs over a UTF-32 codepoint array (JIT call
+# and array setup overhead dominate for shorter strings)
+_SCRIPT_SCAN_NUMPY_MIN_CHARS = 256
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _count_scripts_jit(codepoints):
+        # One pass, no temporaries: branch-free range tests per codepoint
+        devanagari = 0
+        ascii_chars = 0
+        for i in range(codepoints.size):
+            c = codepoints[i]
+            devanagari += (c >= 0x0900) & (c <= 0x097F)
+            ascii_chars += c < 0x80
+        return devanagari, ascii_chars
+
+
+def _count_scripts(codepoints: np.ndarray):
+    """(Devanagari, ASCII) character counts of a uint32 codepoint array"""
+    if njit is not None:
+        return _count_scripts_jit(codepoints)
+    devanagari = np.count_nonzero((codepoints >= 0x0900) & (codepoints <= 0x097F))
+    return devanagari, np.count_nonzero(codepoints < 0x80)
+
+
+def _get_fasttext_model():
+    """Load the lid.176 model once; False if fasttext or the model is missing"""
+    global _fasttext_model
+    if _fasttext_model is None:
+        with _fasttext_lock:
+            if _fasttext_model is None:
+                _fasttext_model = _load_fasttext_model()
+    return _fasttext_model
+
+
+def _load_fasttext_model():
+    """fastText model from settings.language_id_model_path, or False"""
+    model_path = settings.language_id_model_path
+    try:
+        import fasttext
+    except ImportError:
+        logger.info("fasttext not installed, using langdetect for language detection")
+        DetectorFactory.seed = 0  # deterministic fallback
+        return False
+    
+    if not os.path.exists(model_path):
+        logger.warning(
+            f"Language ID model not found at {model_path}, using langdetect"
+        )
+        DetectorFactory.seed = 0
+        return False
+    
+    logger.info(f"Loading fastText language ID model: {model_path}")
+    return fasttext.load_model(model_path)
+
+
+def preload():
+    """
+    Load the language ID model (or langdetect's profiles) now rather than
+    on the first request. Called in the parent process before workers
+    fork, so they share the loaded pages copy-on-write.
+    """
+    if _get_fasttext_model() is False:
+        init_factory()
+
+
+def _script_language(text: str) -> Optional[str]:
+    """
+    'hi' / 'en' when the script alone decides the language, else None
+    
+    Devanagari (U+0900-U+097F) above 30% of characters means Hindi;
+    near-pure ASCII means English. Anything else goes to the model.
+    """
+    if text.isascii():
+        return 'en'
+    
+    if len(text) >= _SCRIPT_SCAN_NUMPY_MIN_CHARS:
+        devanagari, ascii_chars = _count_scripts(np.frombuffer(
+            text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+        ))
+    else:
+        devanagari = sum(1 for c in text if '\u0900' <= c <= '\u097f')
+        ascii_chars = sum(1 for c in text if c < '\x80')
+    
+    if devanagari > _DEVANAGARI_MIN_SHARE * len(text):
+        return 'hi'
+    if ascii_chars > _ASCII_MIN_SHARE * len(text):
+        return 'en'
+    return None
+
+
+def _detect_raw_batch(texts: List[str]) -> List[str]:
+    """ISO 639-1 code of the most likely language for each text"""
+    model = _get_fasttext_model()
+    if model is not False:
+        # One predict call runs the C++ loop over the whole batch;
+        # fastText predicts on single lines
+        labels, _ = model.predict([text.replace("\n", " ") for text in texts], k=1)
+        return [label[0][len(_FASTTEXT_LABEL_PREFIX):] for label in labels]
+    
+    # langdetect returns ISO 639-1 codes
+    langs = []
+    for text in texts:
+        try:
+            langs.append(detect(text))
+        except LangDetectException as e:
+            logger.error(f"Language detection failed: {e}, defaulting to English")
+            langs.append('en')
+    return langs
+
+
+def _map_language(lang: str) -> str:
+    """Map a detected code to our supported languages"""
+    if lang in ['en']:
+        return 'en'
+    elif lang in ['hi']:
+        return 'hi'
+    # Default to English for unsupported languages
+    logger.warning(f"Unsupported language detected: {lang}, defaulting to English")
+    return 'en'
+
+
+def detect_languages_batch(texts: List[str]) -> List[str]:
+    """
+    Detect the language of many texts in one call
+    
+    Args:
+        texts: Input texts
+    
+    Returns:
+        Language codes ('en' or 'hi'), in input order
+    """
+    if not texts:
+        return []
+    
+    detected = [_script_language(text) for text in texts]
+    
+    # Only mixed-script texts need the language ID model
+    undecided = [i for i, lang in enumerate(detected) if lang is None]
+    if undecided:
+        raw = _detect_raw_batch([texts[i] for i in undecided])
+        for i, lang in zip(undecided, raw):
+            detected[i] = _map_language(lang)
+    
+    logger.info(
+        f"Detected languages for {len(texts)} texts: "
+        f"{detected.count('hi')} hi, {detected.count('en')} en"
+    )
+    return detected
+
 
 def detect_language(text: str) -> str:
     """
@@ -19,23 +195,4 @@ def detect_language(text: str) -> str:
     Returns:
         Language code ('en' or 'hi')
     """
-    try:
-        # langdetect returns ISO 639-1 codes
-        lang = detect(text)
-        
-        # Map to our supported languages
-        if lang in ['en']:
-            detected = 'en'
-        elif lang in ['hi']:
-            detected = 'hi'
-        else:
-            # Default to English for unsupported languages
-            logger.warning(f"Unsupported language detected: {lang}, defaulting to English")
-            detected = 'en'
-        
-        logger.info(f"Detected language: {detected}")
-        return detected
-        
-    except LangDetectException as e:
-        logger.error(f"Language detection failed: {e}, defaulting to English")
-        return 'en'
+    return detect_languages_batch([text])[0]
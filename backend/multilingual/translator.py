@@ -1,22 +1,98 @@
 """
 Translation Module
-Placeholder for Hindi ↔ English translation
-To be implemented with IndicTrans2 or NLLB
+Hindi ↔ English translation with NLLB-200 (batched seq2seq inference)
 """
 
+import re
+import threading
+from typing import Dict, List, Tuple
+
+from backend.core.batching import MicroBatcher
 from backend.core.logging import get_logger
 from backend.core.config import settings
 
 logger = get_logger()
 
 
+# NLLB uses FLORES-200 language codes
+NLLB_LANGUAGE_CODES = {
+    "en": "eng_Latn",
+    "hi": "hin_Deva",
+}
+
+# NLLB is trained on sentences; split on terminal punctuation (incl. danda)
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?।])\s+")
+
+
+def _split_segments(text: str) -> List[Tuple[str, str]]:
+    """
+    Split text into (sentence, separator) pairs so translations can be
+    stitched back together with the original line breaks
+    """
+    segments = []
+    for line in text.split("\n"):
+        sentences = [s for s in _SENTENCE_SPLIT_RE.split(line.strip()) if s]
+        for sentence in sentences[:-1]:
+            segments.append((sentence, " "))
+        segments.append((sentences[-1] if sentences else "", "\n"))
+    # No separator after the last line
+    segments[-1] = (segments[-1][0], "")
+    return segments
+
+
 class Translator:
     """Translator for English ↔ Hindi"""
     
-    def __init__(self):
-        # Placeholder - actual translation model initialization
-        logger.info("Translator initialized (placeholder)")
-        logger.warning("Translation not yet implemented - returning original text")
+    def __init__(self, model_name: str = None):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+        from backend.embeddings.embedder import _resolve_device
+        
+        self.model_name = model_name or settings.translation_model
+        self.device = _resolve_device(settings.translation_device)
+        self.batch_size = settings.translation_batch_size
+        # tokenizer.src_lang is mutable state; one generate() at a time
+        self._lock = threading.Lock()
+        
+        logger.info(f"Loading translation model: {self.model_name} (device={self.device})")
+        
+        try:
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            
+            if self.device == "cuda" and settings.translation_quantize:
+                # int8 weights via bitsandbytes: half the memory of fp16
+                from transformers import BitsAndBytesConfig
+                self.model = AutoModelForSeq2SeqLM.from_pretrained(
+                    self.model_name,
+                    quantization_config=BitsAndBytesConfig(load_in_8bit=True),
+                    torch_dtype=torch.float16,
+                    device_map="auto"
+                )
+            else:
+                self.model = AutoModelForSeq2SeqLM.from_pretrained(
+                    self.model_name,
+                    torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
+                    low_cpu_mem_usage=True
+                ).to(self.device)
+                
+                if self.device == "cpu" and settings.translation_quantize:
+                    # Dynamic int8 quantization of the Linear layers
+                    self.model = torch.quantization.quantize_dynamic(
+                        self.model, {torch.nn.Linear}, dtype=torch.qint8
+                    )
+            
+            self.model.eval()
+            # Inputs are truncated only at the model's own window, never at
+            # the (shorter) generation budget
+            self.max_input_length = min(
+                self.tokenizer.model_max_length,
+                getattr(self.model.config, "max_position_embeddings", None)
+                or self.tokenizer.model_max_length
+            )
+            logger.info("Translation model loaded successfully")
+        except Exception as e:
+            logger.error(f"Failed to load translation model: {e}")
+            raise
     
     def translate(
         self,
@@ -35,37 +111,160 @@ class Translator:
         Returns:
             Translated text
         """
+        return self.translate_batch([text], source_lang, target_lang)[0]
+    
+    def translate_batch(
+        self,
+        texts: List[str],
+        source_lang: str,
+        target_lang: str
+    ) -> List[str]:
+        """
+        Translate several texts with batched generate() calls
+        
+        Texts are split into sentences; unique sentences across all texts
+        are length-sorted and translated batch_size at a time.
+        
+        Args:
+            texts: Texts to translate
+            source_lang: Source language code ('en' or 'hi')
+            target_lang: Target language code ('en' or 'hi')
+        
+        Returns:
+            Translated texts, in input order
+        """
         # Skip if same language
-        if source_lang == target_lang:
-            return text
+        if source_lang == target_lang or not texts:
+            return list(texts)
         
-        # Placeholder implementation
-        # TODO: Integrate IndicTrans2 or NLLB
-        logger.warning(f"Translation {source_lang} → {target_lang} not implemented")
+        if source_lang not in NLLB_LANGUAGE_CODES or target_lang not in NLLB_LANGUAGE_CODES:
+            logger.warning(f"Translation {source_lang} → {target_lang} not supported")
+            return list(texts)
         
-        #Return original text for now
-        return text
+        split_texts = [_split_segments(text) for text in texts]
+        unique = list(dict.fromkeys(
+            sentence for segments in split_texts for sentence, _ in segments if sentence
+        ))
+        
+        logger.info(
+            f"Translating {len(texts)} texts ({len(unique)} unique sentences) "
+            f"{source_lang} → {target_lang}"
+        )
+        
+        translated = dict(zip(
+            unique, self._generate(unique, source_lang, target_lang)
+        ))
+        
+        return [
+            "".join(
+                (translated[sentence] if sentence else "") + separator
+                for sentence, separator in segments
+            )
+            for segments in split_texts
+        ]
+    
+    def _generate(
+        self,
+        sentences: List[str],
+        source_lang: str,
+        target_lang: str
+    ) -> List[str]:
+        """Run the model over sentences, batch_size at a time"""
+        import torch
+        
+        # Length-sort so each batch pads to similar lengths
+        order = sorted(range(len(sentences)), key=lambda i: -len(sentences[i]))
+        outputs: List[str] = [""] * len(sentences)
+        target_id = self.tokenizer.convert_tokens_to_ids(NLLB_LANGUAGE_CODES[target_lang])
+        
+        with self._lock, torch.inference_mode():
+            self.tokenizer.src_lang = NLLB_LANGUAGE_CODES[source_lang]
+            
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                inputs = self.tokenizer(
+                    [sentences[i] for i in batch],
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_input_length,
+                    return_tensors="pt"
+                ).to(self.model.device)
+                
+                generated = self.model.generate(
+                    **inputs,
+                    forced_bos_token_id=target_id,
+                    max_new_tokens=settings.translation_max_new_tokens,
+                    num_beams=1
+                )
+                decoded = self.tokenizer.batch_decode(generated, skip_special_tokens=True)
+                for i, text in zip(batch, decoded):
+                    outputs[i] = text
+        
+        return outputs
 
 
-# Global translator instance
+def _translate_pending(items: List[Tuple[str, str, str]]) -> List[str]:
+    """Translate queued (text, source_lang, target_lang), one batch per language pair"""
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for i, (_, source_lang, target_lang) in enumerate(items):
+        groups.setdefault((source_lang, target_lang), []).append(i)
+    
+    results: List[str] = [""] * len(items)
+    for (source_lang, target_lang), positions in groups.items():
+        translated = get_translator().translate_batch(
+            [items[i][0] for i in positions], source_lang, target_lang
+        )
+        for i, text in zip(positions, translated):
+            results[i] = text
+    return results
+
+
+# Global translator instance (lazy loaded)
 _translator = None
+_translator_lock = threading.Lock()
+_batcher = None
+_batcher_lock = threading.Lock()
 
 
 def get_translator() -> Translator:
     """Get or create global translator"""
     global _translator
     if _translator is None:
-        _translator = Translator()
+        # Concurrent first requests must not each load the model weights
+        with _translator_lock:
+            if _translator is None:
+                _translator = Translator()
     return _translator
 
 
+def _get_batcher() -> MicroBatcher:
+    """
+    Get or start the translate_text() batching thread: requests arriving
+    within the window are grouped by language pair and translated with
+    one translate_batch() call
+    """
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    _translate_pending,
+                    max_batch=settings.translation_batch_size,
+                    window_seconds=settings.translation_batch_window_ms / 1000,
+                    name="translation-batcher"
+                )
+    return _batcher
+
+
 def translate_text(
     text: str,
     source_lang: str = "en",
     target_lang: str = "hi"
 ) -> str:
     """Convenience function for translation"""
-    if not settings.enable_translation:
+    if not settings.enable_translation or source_lang == target_lang:
         return text
     
+    if settings.translation_batch_window_ms > 0:
+        return _get_batcher().submit((text, source_lang, target_lang))
     return get_translator().translate(text, source_lang, target_lang)
@@ -4,9 +4,12 @@ Generates structured legal information responses using LLaMA/Mistral
 """
 
 
-from typing import List, Dict
+import threading
+from functools import lru_cache
+from typing import Iterator, List, Dict, Sequence, Tuple, Union
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+from transformers import AutoTokenizer, AutoModelForCausalLM, TextIteratorStreamer
+from backend.core.batching import MicroBatcher
 from backend.core.config import settings
 from backend.core.logging import get_logger
 
@@ -14,6 +17,54 @@ from backend.core.logging import get_logger
 logger = get_logger()
 
 
+# Returned/yielded instead of an answer when generation fails
+GENERATION_ERROR = "I apologize, but I encountered an error. Please consult a legal professional."
+
+
+def _cpu_has_native_bf16() -> bool:
+    """AVX512-BF16 or AMX; elsewhere CPU bf16 matmuls are emulated (slower than fp32)"""
+    cpu = getattr(torch._C, "_cpu", None)
+    checks = ("_is_avx512_bf16_supported", "_is_amx_tile_supported")
+    try:
+        return any(getattr(cpu, name)() for name in checks if hasattr(cpu, name))
+    except Exception:
+        return False
+
+
+def _model_dtype_kwargs() -> Dict:
+    """from_pretrained dtype/quantization arguments for settings.llm_dtype"""
+    dtype = settings.llm_dtype
+    if dtype == "int8":
+        # bitsandbytes LLM.int8 (CUDA only); non-quantized modules in fp16
+        from transformers import BitsAndBytesConfig
+        return {
+            "quantization_config": BitsAndBytesConfig(load_in_8bit=True),
+            "torch_dtype": torch.float16,
+        }
+    if dtype == "auto":
+        # bf16 halves weight bandwidth without fp16's overflow risk; GPUs
+        # older than Ampere lack bf16 and get fp16, CPUs without native
+        # bf16 get fp32
+        if torch.cuda.is_available():
+            dtype = "bfloat16" if torch.cuda.is_bf16_supported() else "float16"
+        else:
+            dtype = "bfloat16" if _cpu_has_native_bf16() else "float32"
+    return {"torch_dtype": getattr(torch, dtype)}
+
+
+def _expand_kv(past_key_values, batch_size: int):
+    """Per-request copy of a batch-1 KV cache, repeated along the batch dim"""
+    def expand(t):
+        return t.expand(batch_size, *t.shape[1:]).clone()
+    
+    if hasattr(past_key_values, "key_cache"):  # transformers Cache object
+        cache = type(past_key_values)()
+        for layer, (k, v) in enumerate(zip(past_key_values.key_cache, past_key_values.value_cache)):
+            cache.update(expand(k), expand(v), layer)
+        return cache
+    return tuple(tuple(expand(t) for t in layer) for layer in past_key_values)
+
+
 
 
 class LegalLLM:
@@ -25,45 +76,260 @@ class LegalLLM:
 
     def __init__(self, model_name: str = None):
         self.model_name = model_name or settings.llm_model_name
+        # Static prompt prefix and its precomputed KV cache (see cache_prefix)
+        self._prefix_text = None
+        self._prefix_ids = None
+        self._prefix_kv = None
         logger.info(f"Loading LLM: {self.model_name}")
         
         try:
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            # Batched prompts are left-padded so generation continues each
+            # one from its last real token
+            self.tokenizer.padding_side = "left"
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
             self.model = AutoModelForCausalLM.from_pretrained(
                 self.model_name,
-                torch_dtype=torch.float32,
                 device_map="auto",
-                low_cpu_mem_usage=True
+                low_cpu_mem_usage=True,
+                **_model_dtype_kwargs()
             )
-            
-            self.generator = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                max_new_tokens=settings.llm_max_tokens,
-                do_sample=True,
-                temperature=settings.llm_temperature
-            )
-            logger.info("LLM loaded successfully")
+            self.model.eval()
+            logger.info(f"LLM loaded successfully ({self.model.dtype})")
         except Exception as e:
             logger.error(f"Failed to load LLM: {e}")
             raise
+        
+        # Token ids of recurring texts (retrieved chunks), see encode_text
+        self._encode_cached = lru_cache(maxsize=settings.llm_token_cache_size)(self._tokenize)
+        
+        # Concurrent generate() calls are coalesced into one batched call
+        self._batcher = None
+        if settings.llm_batch_size > 1 and settings.llm_batch_window_ms > 0:
+            self._batcher = MicroBatcher(
+                self.generate_batch,
+                max_batch=settings.llm_batch_size,
+                window_seconds=settings.llm_batch_window_ms / 1000,
+                name="llm-batcher"
+            )
+
+
+    def cache_prefix(self, prefix: str):
+        """
+        Register a static prompt prefix (e.g. the system prompt): it is
+        tokenized once and, unless llm_cache_system_prompt is off, prefilled
+        once with its KV cache kept. Prompts starting with this prefix then
+        only tokenize and prefill their dynamic tail.
+        
+        Args:
+            prefix: Exact leading text of the prompts passed to generate()
+        """
+        prefix_ids = self.tokenizer(prefix, return_tensors="pt").input_ids.to(self.model.device)
+        self._prefix_text = prefix
+        self._prefix_ids = prefix_ids
+        self._prefix_kv = None
+        
+        if not settings.llm_cache_system_prompt:
+            return
+        
+        with torch.inference_mode():
+            outputs = self.model(input_ids=prefix_ids, use_cache=True)
+        self._prefix_kv = outputs.past_key_values
+        logger.info(f"Cached KV for {prefix_ids.shape[1]}-token prompt prefix")
+
+
+    def _tokenize(self, text: str) -> Tuple[int, ...]:
+        return tuple(self.tokenizer(text, add_special_tokens=False).input_ids)
+
+
+    def encode_text(self, text: str) -> Tuple[int, ...]:
+        """
+        Token ids of a prompt fragment (no special tokens)
+        
+        Results are LRU-cached: retrieved chunks recur across queries, so
+        their ids are reused instead of re-tokenizing the whole context.
+        """
+        return self._encode_cached(text)
+
+
+    def _encode(self, prompts: List[Union[str, Sequence[int]]]):
+        """
+        Batched input ids, attention mask and KV cache for prompts
+        
+        Prompts are strings, or token-id sequences that continue the
+        registered prefix (see generate_from_ids). When every prompt
+        starts with the prefix, only the tails are tokenized:
+        [prefix | left padding | tail], with the prefix KV (if cached)
+        repeated per row. Position ids come from the attention mask, so
+        the padding gap does not shift the tail's positions.
+        """
+        if self._prefix_ids is not None and all(
+            not isinstance(p, str) or p.startswith(self._prefix_text) for p in prompts
+        ):
+            tails = [
+                self._tokenize(p[len(self._prefix_text):]) if isinstance(p, str) else p
+                for p in prompts
+            ]
+            width = max(len(tail) for tail in tails)
+            pad_id = self.tokenizer.pad_token_id
+            tail_ids = torch.tensor(
+                [[pad_id] * (width - len(tail)) + list(tail) for tail in tails],
+                dtype=torch.long,
+                device=self.model.device
+            )
+            tail_mask = torch.tensor(
+                [[0] * (width - len(tail)) + [1] * len(tail) for tail in tails],
+                dtype=torch.long,
+                device=self.model.device
+            )
+            batch_size = len(prompts)
+            prefix_ids = self._prefix_ids.expand(batch_size, -1)
+            input_ids = torch.cat([prefix_ids, tail_ids], dim=1)
+            attention_mask = torch.cat([torch.ones_like(prefix_ids), tail_mask], dim=1)
+            # generate() extends the cache; each call gets its own copy
+            past_key_values = None
+            if self._prefix_kv is not None:
+                past_key_values = _expand_kv(self._prefix_kv, batch_size)
+            return input_ids, attention_mask, past_key_values
+        
+        inputs = self.tokenizer(prompts, padding=True, return_tensors="pt").to(self.model.device)
+        return inputs.input_ids, inputs.attention_mask, None
+
+
+    def _generation_kwargs(self) -> Dict:
+        """Decoding arguments shared by batched and streamed generation"""
+        kwargs = {
+            "use_cache": True,
+            "max_new_tokens": settings.llm_max_tokens,
+            "pad_token_id": self.tokenizer.pad_token_id,
+            "do_sample": False,
+        }
+        # temperature 0 = greedy decoding (deterministic, so repeated
+        # prompts give the same answer)
+        if settings.llm_temperature > 0:
+            kwargs.update(do_sample=True, temperature=settings.llm_temperature)
+        return kwargs
+
+
+    def generate_batch(self, prompts: List[Union[str, Sequence[int]]]) -> List[str]:
+        """
+        Generate answers for several prompts with one model.generate call
+        
+        Args:
+            prompts: Full prompts, or token ids following the cached prefix
+        
+        Returns:
+            Generated text per prompt (prompt not included), in input order
+        """
+        # The micro-batcher can mix prefix continuations with plain prompts;
+        # they cannot share one padded batch, so each kind gets its own call
+        if self._prefix_ids is not None:
+            continues = [
+                not isinstance(p, str) or p.startswith(self._prefix_text) for p in prompts
+            ]
+            if any(continues) and not all(continues):
+                results = [None] * len(prompts)
+                for kind in (True, False):
+                    positions = [i for i, c in enumerate(continues) if c == kind]
+                    texts = self.generate_batch([prompts[i] for i in positions])
+                    for i, text in zip(positions, texts):
+                        results[i] = text
+                return results
+        
+        logger.info(f"Generating LLM responses for {len(prompts)} prompts")
+        input_ids, attention_mask, past_key_values = self._encode(prompts)
+        
+        with torch.inference_mode():
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
+                **self._generation_kwargs()
+            )
+        
+        # Decode only the new generation (prompt tokens are skipped)
+        return [
+            text.strip()
+            for text in self.tokenizer.batch_decode(
+                output_ids[:, input_ids.shape[1]:],
+                skip_special_tokens=True
+            )
+        ]
 
 
-    def generate(self, prompt: str) -> str:
+    def generate(self, prompt: Union[str, Sequence[int]]) -> str:
         """
-        Generate answer from prompt
+        Generate answer from prompt (text, or ids after the cached prefix)
         """
         try:
             logger.info("Generating LLM response")
-            output = self.generator(prompt)
-            generated_text = output[0]["generated_text"]
-            
-            # Extract only the new generation (remove prompt)
-            if generated_text.startswith(prompt):
-                generated_text = generated_text[len(prompt):].strip()
-            
-            return generated_text
+            if self._batcher is not None:
+                return self._batcher.submit(prompt)
+            return self.generate_batch([prompt])[0]
         except Exception as e:
             logger.error(f"LLM generation failed: {e}")
-            return "I apologize, but I encountered an error. Please consult a legal professional."
+            return GENERATION_ERROR
+
+
+    def generate_from_ids(self, tail_ids: Sequence[int]) -> str:
+        """
+        Generate from token ids that continue the prefix registered with
+        cache_prefix, skipping tokenization of the prompt entirely
+        
+        Args:
+            tail_ids: Prompt ids after the prefix (e.g. built from
+                encode_text pieces)
+        """
+        if self._prefix_ids is None:
+            raise RuntimeError("generate_from_ids requires cache_prefix() first")
+        return self.generate(tuple(tail_ids))
+
+
+    def generate_stream(self, prompt: Union[str, Sequence[int]]) -> Iterator[str]:
+        """
+        Yield the answer in text pieces while it is being generated, so
+        callers can show it after the first token instead of the last
+        
+        Bypasses the micro-batcher (the streamer follows one sequence).
+        
+        Args:
+            prompt: Full prompt, or token ids after the cached prefix
+        """
+        logger.info("Streaming LLM response")
+        if not isinstance(prompt, str):
+            prompt = tuple(prompt)
+        
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True
+        )
+        errors = []
+        
+        def run():
+            try:
+                input_ids, attention_mask, past_key_values = self._encode([prompt])
+                with torch.inference_mode():
+                    self.model.generate(
+                        input_ids=input_ids,
+                        attention_mask=attention_mask,
+                        past_key_values=past_key_values,
+                        streamer=streamer,
+                        **self._generation_kwargs()
+                    )
+            except Exception as e:
+                logger.error(f"LLM generation failed: {e}")
+                errors.append(e)
+                streamer.end()  # unblock the consumer
+        
+        threading.Thread(target=run, name="llm-stream", daemon=True).start()
+        
+        produced = False
+        for piece in streamer:
+            produced = produced or bool(piece)
+            yield piece
+        if errors:
+            # Always the last piece on failure, so callers can tell a cut-off
+            # answer from a complete one
+            if produced:
+                yield "\n\n"
+            yield GENERATION_ERROR
@@ -1,90 +1,192 @@
-from backend.vectorstore.vector_manager import VectorManager
-from backend.rag.generator import LegalLLM
-from backend.db.session import SessionLocal
-from backend.db.models import QueryLog
+from backend.vectorstore.vector_manager import VectorManager, corpus_version
+from backend.rag.generator import LegalLLM, GENERATION_ERROR
+from backend.rag.response_cache import ResponseCache
+from backend.core.config import settings
+from backend.db.query_log import log_query
+from backend.core.logging import get_logger
+import atexit
+import functools
 import os
 
 
+logger = get_logger()
+
+
+
+
+@functools.lru_cache(maxsize=1)
+def _load_system_prompt():
+    """System prompt text, read from disk once per process"""
+    path = os.path.join(
+        "backend",
+        "prompts",
+        "system_prompt.txt"
+    )
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
 
 
 class LegalRAGPipeline:
     def __init__(self):
         self.vector_manager = VectorManager()
         self.llm = LegalLLM()
-        self.system_prompt = self._load_system_prompt()
+        self.system_prompt = _load_system_prompt()
+        # Every prompt starts with the system prompt; prefill it once
+        self.llm.cache_prefix(self._prompt_prefix())
+        
+        self.response_cache = None
+        if settings.response_cache_size > 0:
+            self.response_cache = ResponseCache(
+                self.vector_manager.user_store.embedding_dim,
+                max_entries=settings.response_cache_size,
+                threshold=settings.response_cache_threshold,
+                path=settings.response_cache_path or None,
+                corpus=self.vector_manager.corpus_fingerprint()
+            )
+            atexit.register(self.response_cache.save)
+        self._cache_corpus_version = corpus_version()
+
+
+    def _select_chunks(self, retrieved_chunks):
+        """
+        Keep the best-ranked chunks whose tokens fit settings.llm_context_token_budget
+        (prefill cost grows with context length). Chunks arrive ranked, so
+        the lowest-ranked are dropped first.
+        
+        Returns:
+            List of (chunk, token ids) pairs
+        """
+        budget = settings.llm_context_token_budget
+        separator_len = len(self.llm.encode_text("\n\n"))
+        selected = []
+        used = 0
+        for chunk in retrieved_chunks:
+            ids = self.llm.encode_text(chunk["text"])
+            cost = len(ids) + (separator_len if selected else 0)
+            # The top chunk is always kept, even if it alone is over budget
+            if budget > 0 and selected and used + cost > budget:
+                break
+            selected.append((chunk, ids))
+            used += cost
+        
+        dropped = len(retrieved_chunks) - len(selected)
+        if dropped:
+            logger.info(
+                f"Context budget {budget} tokens: dropped {dropped} of "
+                f"{len(retrieved_chunks)} retrieved chunks"
+            )
+        return selected
+
+
+    def _prompt_prefix(self):
+        """Static head shared by every prompt"""
+        return f"""
+{self.system_prompt}
 
 
-    def _load_system_prompt(self):
-        path = os.path.join(
-            "backend",
-            "prompts",
-            "system_prompt.txt"
-        )
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
+"""
 
 
-    def _build_context(self, retrieved_chunks):
+    def _build_prompt_ids(self, query, retrieved_chunks):
         """
-        Combine retrieved texts into a single context block.
+        Token ids of the prompt after the cached prefix (context block,
+        user question, answer cue), assembled from per-chunk ids cached
+        by the LLM instead of re-tokenizing the whole context every query
         """
-        context = "\n\n".join([chunk["text"] for chunk in retrieved_chunks])
-        return context
+        encode = self.llm.encode_text
+        ids = list(encode("Context:\n"))
+        separator = encode("\n\n")
+        for i, (_, chunk_ids) in enumerate(self._select_chunks(retrieved_chunks)):
+            if i:
+                ids.extend(separator)
+            ids.extend(chunk_ids)
+        ids.extend(encode(f"\n\n\nUser Question:\n{query}\n\n\nAnswer:\n"))
+        return ids
+
+
+    def _cached_response(self, query):
+        """(query embedding, cached answer or None); (None, None) without a cache"""
+        if self.response_cache is None:
+            return None, None
+        if corpus_version() != self._cache_corpus_version:
+            # New documents can change answers
+            self.response_cache.clear(corpus=self.vector_manager.corpus_fingerprint())
+            self._cache_corpus_version = corpus_version()
+        query_emb = self.vector_manager.embedder.embed_query(query)
+        return query_emb, self.response_cache.get(query_emb, query_text=query)
 
 
-    def _build_prompt(self, query, context):
-        prompt = f"""
-{self.system_prompt}
+    def answer_query(self, query: str, language: str = "en"):
+        """
+        Full RAG flow
+        """
 
 
-Context:
-{context}
+        # 0. Near-duplicate of a past query: reuse its answer
+        query_emb, response = self._cached_response(query)
 
 
-User Question:
-{query}
+        if response is None:
+            # 1. Retrieve relevant chunks
+            retrieved_chunks = self.vector_manager.search(query, top_k=5)
 
 
-Answer:
-"""
-        return prompt
+            if not retrieved_chunks:
+                return "No relevant legal information found."
 
 
-    def answer_query(self, query: str, language: str = "en"):
-        """
-        Full RAG flow
-        """
+            # 2-3. Build prompt (context + question) as token ids
+            prompt_ids = self._build_prompt_ids(query, retrieved_chunks)
+
 
+            # 4. Generate answer
+            response = self.llm.generate_from_ids(prompt_ids)
+            
+            # Only successful answers are cached; a transient failure must
+            # not be replayed for every similar query
+            if self.response_cache is not None and response != GENERATION_ERROR:
+                self.response_cache.put(query_emb, response, query_text=query)
 
-        # 1. Retrieve relevant chunks
-        retrieved_chunks = self.vector_manager.search(query, top_k=5)
 
+        # 5. Log query (written in the background, batched)
+        log_query(query, language)
 
-        if not retrieved_chunks:
-            return "No relevant legal information found."
 
+        return response
 
-        # 2. Build context
-        context = self._build_context(retrieved_chunks)
 
+    def answer_query_stream(self, query: str, language: str = "en"):
+        """
+        Full RAG flow, yielding the answer in pieces as it is generated
+        (same steps and caching as answer_query)
+        """
+        query_emb, response = self._cached_response(query)
 
-        # 3. Build prompt
-        prompt = self._build_prompt(query, context)
 
+        if response is not None:
+            yield response
+        else:
+            retrieved_chunks = self.vector_manager.search(query, top_k=5)
 
-        # 4. Generate answer
-        response = self.llm.generate(prompt)
 
+            if not retrieved_chunks:
+                yield "No relevant legal information found."
+                return
 
-        # 5. Log query
-        db = SessionLocal()
-        log = QueryLog(
-            query_text=query,
-            language=language
-        )
-        db.add(log)
-        db.commit()
-        db.close()
 
+            prompt_ids = self._build_prompt_ids(query, retrieved_chunks)
 
-        return response
+
+            pieces = []
+            for piece in self.llm.generate_stream(prompt_ids):
+                pieces.append(piece)
+                yield piece
+            
+            failed = bool(pieces) and pieces[-1] == GENERATION_ERROR
+            if self.response_cache is not None and not failed:
+                self.response_cache.put(query_emb, "".join(pieces).strip(), query_text=query)
+
+
+        log_query(query, language)
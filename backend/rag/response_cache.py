@@ -0,0 +1,156 @@
+"""
+Semantic Response Cache
+Returns a stored answer when a new query is a near-duplicate of a past one
+"""
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import faiss
+import numpy as np
+from backend.core.logging import get_logger
+
+logger = get_logger()
+
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def _numbers(query_text: Optional[str]) -> Optional[List[str]]:
+    """Numbers in a query (section, article, year...), order-independent"""
+    if query_text is None:
+        return None
+    return sorted(_NUMBER_RE.findall(query_text))
+
+
+class ResponseCache:
+    """
+    LRU cache of generated answers keyed by query embedding
+    A hit (cosine >= threshold) skips retrieval and generation entirely
+    """
+
+    def __init__(
+        self,
+        embedding_dim: int,
+        max_entries: int = 1000,
+        threshold: float = 0.95,
+        path: str = None,
+        corpus: str = None
+    ):
+        self.embedding_dim = embedding_dim
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.path = path
+        # Fingerprint of the corpus the answers were generated from; a
+        # saved cache for a different corpus is not loaded
+        self.corpus = corpus
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # Entry id -> (response, numbers in the query), least recently used first
+        self._responses: "OrderedDict[int, Tuple[str, Optional[List[str]]]]" = OrderedDict()
+        # Exact inner product over L2-normalized query embeddings (= cosine);
+        # explicit ids so evicted entries can be removed in place
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(embedding_dim))
+
+        if path and os.path.exists(f"{path}.index"):
+            self._load()
+
+    @staticmethod
+    def _as_row(query_embedding: np.ndarray) -> np.ndarray:
+        """(1, dim) float32, L2-normalized"""
+        row = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(row)
+        return row
+
+    def get(self, query_embedding: np.ndarray, query_text: str = None) -> Optional[str]:
+        """
+        Cached response for the nearest past query, or None on a miss
+
+        Embeddings barely move between "IPC 302" and "IPC 304", so when
+        query_text is given a hit also needs the same numbers in the query.
+        """
+        with self._lock:
+            if self.index.ntotal == 0:
+                return None
+            scores, ids = self.index.search(self._as_row(query_embedding), 1)
+            entry_id = int(ids[0, 0])
+            if entry_id < 0 or scores[0, 0] < self.threshold:
+                return None
+            response, numbers = self._responses[entry_id]
+            if query_text is not None and numbers is not None and numbers != _numbers(query_text):
+                logger.info(f"Response cache near-miss: query numbers differ (similarity {scores[0, 0]:.3f})")
+                return None
+            self._responses.move_to_end(entry_id)
+            logger.info(f"Response cache hit (similarity {scores[0, 0]:.3f})")
+            return response
+
+    def put(self, query_embedding: np.ndarray, response: str, query_text: str = None):
+        """Store a response, evicting the least recently used entries"""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(
+                self._as_row(query_embedding), np.array([entry_id], dtype=np.int64)
+            )
+            self._responses[entry_id] = (response, _numbers(query_text))
+
+            overflow = len(self._responses) - self.max_entries
+            if overflow > 0:
+                evicted = [self._responses.popitem(last=False)[0] for _ in range(overflow)]
+                self.index.remove_ids(np.array(evicted, dtype=np.int64))
+
+    def clear(self, corpus: str = None):
+        """Drop every entry (e.g. after the document corpus changed)"""
+        with self._lock:
+            self.index.reset()
+            self._responses.clear()
+            if corpus is not None:
+                self.corpus = corpus
+
+    def save(self):
+        """Write the index and responses to self.path (no-op without a path)"""
+        if not self.path:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            faiss.write_index(self.index, f"{self.path}.index")
+            with open(f"{self.path}.json", "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "corpus": self.corpus,
+                        "next_id": self._next_id,
+                        "responses": [
+                            [entry_id, response, numbers]
+                            for entry_id, (response, numbers) in self._responses.items()
+                        ]
+                    },
+                    f,
+                    ensure_ascii=False
+                )
+        logger.info(f"Response cache saved: {len(self._responses)} entries")
+
+    def _load(self):
+        """Restore a cache written by save()"""
+        try:
+            index = faiss.read_index(f"{self.path}.index")
+            with open(f"{self.path}.json", "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load response cache from {self.path}: {e}")
+            return
+        if state.get("corpus") != self.corpus:
+            # Answers generated before documents were added or re-ingested
+            logger.info("Response cache discarded: saved for a different corpus")
+            return
+        self.index = index
+        self._next_id = state["next_id"]
+        self._responses = OrderedDict(
+            (int(entry_id), (response, numbers))
+            for entry_id, response, numbers in state["responses"]
+        )
+        logger.info(f"Response cache loaded: {len(self._responses)} entries")
+
+    def __len__(self) -> int:
+        return len(self._responses)
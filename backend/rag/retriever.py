@@ -3,16 +3,68 @@ Document Retrieval Logic
 Retrieves relevant documents from FAISS index
 """
 
-from typing import List, Dict
+import threading
+from typing import List, Dict, Tuple
+import numpy as np
+from backend.core.batching import MicroBatcher
+from backend.core.config import settings
 from backend.vectorstore.faiss_store import get_store
-from backend.embeddings.embedder import embed_query
 from backend.core.logging import get_logger
 
 logger = get_logger()
 
 
+class RetrievalResult:
+    """
+    Hits of one query as parallel arrays (ranked, best first); scores stay
+    a NumPy array so threshold filtering is one vector comparison
+    """
+    
+    def __init__(self, ids: np.ndarray, scores: np.ndarray, texts: List[str], document_ids: List[str]):
+        self.ids = ids
+        self.scores = scores
+        self.texts = texts
+        self.document_ids = document_ids
+    
+    @classmethod
+    def from_hits(cls, hits: List[Dict]) -> "RetrievalResult":
+        """Build from the store's per-hit dicts"""
+        return cls(
+            np.fromiter((hit["id"] for hit in hits), dtype=np.int64, count=len(hits)),
+            np.fromiter((hit["score"] for hit in hits), dtype=np.float32, count=len(hits)),
+            [hit["text"] for hit in hits],
+            [hit["document_id"] for hit in hits]
+        )
+    
+    def top(self, k: int) -> "RetrievalResult":
+        """First k hits"""
+        return RetrievalResult(self.ids[:k], self.scores[:k], self.texts[:k], self.document_ids[:k])
+    
+    def above(self, threshold: float) -> "RetrievalResult":
+        """Hits scoring at least threshold; ranked, so this is a prefix"""
+        n = int(np.count_nonzero(self.scores >= threshold))
+        return self.top(n)
+    
+    def to_documents(self) -> List[Dict]:
+        """Per-hit dicts (id, text, document_id, relevance_score)"""
+        return [
+            {
+                "id": idx,
+                "text": text,
+                "document_id": document_id,
+                "relevance_score": score,  # cosine similarity
+            }
+            for idx, text, document_id, score in zip(
+                self.ids.tolist(), self.texts, self.document_ids, self.scores.tolist()
+            )
+        ]
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
 class Retriever:
-    """Document retriever using FAISS"""
+    """Document retriever over the FAISS HNSW index"""
     
     def __init__(self, top_k: int = 5):
         """
@@ -23,6 +75,18 @@ class Retriever:
         """
         self.top_k = top_k
         self.store = get_store()
+        if settings.faiss_use_gpu:
+            self.store.enable_gpu()
+        
+        # Concurrent retrieve() calls share one embedding batch and search
+        self._batcher = None
+        if settings.retrieval_batch_window_ms > 0:
+            self._batcher = MicroBatcher(
+                lambda items: self.retrieve_batch(*zip(*items)),
+                max_batch=settings.retrieval_batch_size,
+                window_seconds=settings.retrieval_batch_window_ms / 1000,
+                name="retrieval-batcher"
+            )
         logger.info(f"Retriever initialized with top_k={top_k}")
     
     def retrieve(self, query: str, k: int = None) -> List[Dict]:
@@ -40,26 +104,40 @@ class Retriever:
         
         logger.info(f"Retrieving documents for query: {query[:50]}...")
         
-        # Generate query embedding
-        query_embedding = embed_query(query)
+        result = self._search(query, k)
         
-        # Search in FAISS
-        results = self.store.search(query_embedding, k=k)
+        logger.info(f"Retrieved {len(result)} documents")
+        return result.to_documents()
+    
+    def _search(self, query: str, k: int) -> RetrievalResult:
+        """One query through the batcher (or directly when batching is off)"""
+        if self._batcher is not None:
+            return self._batcher.submit((query, k))
+        return self.retrieve_batch([query], [k])[0]
+    
+    def retrieve_batch(
+        self,
+        queries: Tuple[str, ...],
+        ks: Tuple[int, ...]
+    ) -> List[RetrievalResult]:
+        """
+        Retrieve documents for several queries at once: one embedding
+        batch and one FAISS search (at the largest k)
         
-        # Format results
-        documents = []
-        for idx, distance, metadata in results:
-            documents.append({
-                "id": idx,
-                "text": metadata.get("text", ""),
-                "section_title": metadata.get("section_title"),
-                "source": metadata.get("source", "unknown"),
-                "relevance_score": float(1 / (1 + distance)),  # Convert distance to similarity
-                "metadata": metadata
-            })
+        Args:
+            queries: User query texts
+            ks: Number of documents to retrieve per query
         
-        logger.info(f"Retrieved {len(documents)} documents")
-        return documents
+        Returns:
+            One RetrievalResult per query
+        """
+        query_embeddings = self.store.embedder.embed_queries(list(queries))
+        results = self.store.similarity_search_batch(query_embeddings, top_k=max(ks))
+        
+        return [
+            RetrievalResult.from_hits(hits).top(k)
+            for k, hits in zip(ks, results)
+        ]
     
     def retrieve_with_threshold(
         self,
@@ -72,33 +150,31 @@ class Retriever:
         
         Args:
             query: User query
-            threshold: Minimum relevance score (0-1)
+            threshold: Minimum relevance score (cosine similarity)
             max_docs: Maximum documents to consider
         
         Returns:
             Filtered list of relevant documents
         """
-        documents = self.retrieve(query, k=max_docs)
-        
-        # Filter by threshold
-        filtered = [
-            doc for doc in documents
-            if doc["relevance_score"] >= threshold
-        ]
+        # Filter by threshold on the score array, before building dicts
+        filtered = self._search(query, max_docs).above(threshold)
         
         logger.info(f"Filtered to {len(filtered)} documents above threshold {threshold}")
-        return filtered
+        return filtered.to_documents()
 
 
 # Global retriever instance
 _retriever = None
+_retriever_lock = threading.Lock()
 
 
 def get_retriever() -> Retriever:
-    """Get or create global retriever"""
+    """Get or create global retriever (one shared query batcher)"""
     global _retriever
     if _retriever is None:
-        _retriever = Retriever()
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = Retriever()
     return _retriever
 
 
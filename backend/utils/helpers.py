@@ -4,6 +4,8 @@ Common utility functions used across the application
 """
 
 import hashlib
+import mmap
+import secrets
 from pathlib import Path
 from typing import Union
 from datetime import datetime, timedelta
@@ -14,19 +16,24 @@ def generate_file_hash(file_path: Union[str, Path]) -> str:
     Generate SHA-256 hash of a file
     Useful for duplicate detection
     """
-    sha256 = hashlib.sha256()
-    
     with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
-            sha256.update(chunk)
-    
-    return sha256.hexdigest()
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+: C loop with the GIL released
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        
+        sha256 = hashlib.sha256()
+        try:
+            # Whole file in one update() call, no Python-level read loop
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                sha256.update(mm)
+        except ValueError:
+            pass  # empty files cannot be mapped
+        return sha256.hexdigest()
 
 
 def generate_session_id() -> str:
-    """Generate unique session ID"""
-    timestamp = datetime.now().isoformat()
-    return hashlib.md5(timestamp.encode()).hexdigest()
+    """Generate unique session ID (128 random bits)"""
+    return secrets.token_hex(16)
 
 
 def is_session_expired(created_at: datetime, expiry_hours: int = 24) -> bool:
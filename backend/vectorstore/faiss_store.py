@@ -1,10 +1,56 @@
+import atexit
 import faiss
 import numpy as np
 import os
-from typing import List, Dict
-from backend.embeddings.embedder import EmbeddingModel
-from backend.db.session import SessionLocal
-from backend.db.models import Document, Chunk
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import List, Dict, Tuple
+from sqlalchemy import func
+from backend.core.config import settings
+from backend.core.logging import get_logger
+from backend.embeddings.embedder import get_embedder
+from backend.db import session as db_session
+from backend.db.models import Document, Chunk, bulk_insert_chunks
+
+
+logger = get_logger()
+
+
+
+
+# Stores with a background index writer, flushed on shutdown
+_open_stores = weakref.WeakSet()
+
+
+def close_all_stores():
+    """Stop background writers and flush pending index saves (shutdown hook)"""
+    for store in list(_open_stores):
+        store.close()
+
+
+atexit.register(close_all_stores)
+
+
+@contextmanager
+def _session_scope(session=None):
+    """
+    Yield the caller's session untouched (the caller commits), or open a
+    new one that is committed and closed here.
+    """
+    if session is not None:
+        yield session
+        return
+
+    db = db_session.SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
 
 
@@ -13,110 +59,442 @@ class FAISSVectorStore:
     def __init__(self, embedding_dim: int = 1024, index_path: str = None):
         self.embedding_dim = embedding_dim
         self.index_path = index_path
-        self.embedder = EmbeddingModel()
+        self.embedder = get_embedder()
+        
+        # Guards the index against adds while it is being serialized
+        self._index_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._closing = threading.Event()
+        self._unsaved = False
+        self._saver = None
+        # Optional GPU replica used for search; self.index stays the
+        # CPU master that is added to and serialized
+        self._gpu_resources = None
+        self._gpu_index = None
         
         # Load existing index if path provided and exists
         if index_path and os.path.exists(index_path):
             self.index = faiss.read_index(index_path)
         else:
-            self.index = faiss.IndexFlatIP(embedding_dim)
+            self.index = self._create_index(embedding_dim)
+        self._configure_search()
+        # Next faiss_index_id to hand out; never below an id already in
+        # the index or the chunks table (see _add_documents)
+        self._next_id = self._end_of_ids(self.index)
+
+
+    @staticmethod
+    def _create_index(embedding_dim: int):
+        """
+        Build an empty inner-product index, wrapped in IndexIDMap2 so
+        vectors are stored under their explicit Chunk.faiss_index_id
+
+        HNSW gives sub-linear search with minor recall loss; "flat" keeps
+        the exact brute-force scan. Vectors are stored scalar-quantized
+        (fp16 or int8) unless faiss_scalar_quantizer is "none"; inputs stay
+        float32 and FAISS quantizes on add.
+
+        "ivfpq" product-quantizes each vector to faiss_pq_m bytes (16 vs
+        2048 for fp16 at d=1024) and scans only faiss_ivf_nprobe of
+        faiss_ivf_nlist clusters per query. It is trained on the first
+        batch added, so build it from a bulk load, not single uploads; the
+        same goes for int8, whose value ranges come from that batch.
+        """
+        if settings.faiss_index_type == "ivfpq":
+            coarse = faiss.IndexFlatIP(embedding_dim)
+            base = faiss.IndexIVFPQ(
+                coarse, embedding_dim, settings.faiss_ivf_nlist,
+                settings.faiss_pq_m, settings.faiss_pq_nbits,
+                faiss.METRIC_INNER_PRODUCT
+            )
+            return faiss.IndexIDMap2(base)
+        
+        quantizer = {
+            "fp16": faiss.ScalarQuantizer.QT_fp16,
+            "int8": faiss.ScalarQuantizer.QT_8bit,
+        }.get(settings.faiss_scalar_quantizer)
+        
+        if settings.faiss_index_type == "flat":
+            if quantizer is None:
+                base = faiss.IndexFlatIP(embedding_dim)
+            else:
+                base = faiss.IndexScalarQuantizer(
+                    embedding_dim, quantizer, faiss.METRIC_INNER_PRODUCT
+                )
+        else:
+            if quantizer is None:
+                base = faiss.IndexHNSWFlat(
+                    embedding_dim, settings.faiss_hnsw_m, faiss.METRIC_INNER_PRODUCT
+                )
+            else:
+                base = faiss.IndexHNSWSQ(
+                    embedding_dim, quantizer, settings.faiss_hnsw_m,
+                    faiss.METRIC_INNER_PRODUCT
+                )
+            base.hnsw.efConstruction = settings.faiss_hnsw_ef_construction
+        return faiss.IndexIDMap2(base)
+
+
+    def _configure_search(self):
+        """Apply query-time HNSW parameters (not persisted by write_index)"""
+        base = faiss.downcast_index(
+            self.index.index if isinstance(self.index, faiss.IndexIDMap) else self.index
+        )
+        if isinstance(base, faiss.IndexHNSW):
+            base.hnsw.efSearch = settings.faiss_hnsw_ef_search
+        elif isinstance(base, faiss.IndexIVF):
+            base.nprobe = settings.faiss_ivf_nprobe
+
+
+    @staticmethod
+    def _end_of_ids(index) -> int:
+        """One past the largest id stored in index"""
+        if isinstance(index, faiss.IndexIDMap) and index.ntotal:
+            return int(faiss.vector_to_array(index.id_map).max()) + 1
+        return index.ntotal
+
+
+    def _min_training_vectors(self) -> int:
+        """Smallest first batch the index can be trained on"""
+        base = faiss.downcast_index(
+            self.index.index if isinstance(self.index, faiss.IndexIDMap) else self.index
+        )
+        if isinstance(base, faiss.IndexIVFPQ):
+            # One point per coarse centroid and per PQ codeword
+            return max(base.nlist, 1 << base.pq.nbits)
+        if isinstance(base, faiss.IndexHNSW):
+            base = faiss.downcast_index(base.storage)
+        if (
+            isinstance(base, faiss.IndexScalarQuantizer)
+            and base.sq.qtype == faiss.ScalarQuantizer.QT_8bit
+        ):
+            # Vectors are clipped to the per-dimension min/max of the
+            # training batch; one small upload would fix a narrow range
+            return settings.faiss_sq_min_training_vectors
+        return 1
+
+
+    def enable_gpu(self, device: int = 0, temp_memory_mb: int = 64) -> bool:
+        """
+        Mirror the index onto a GPU for search (needs a faiss-gpu build)
+
+        Only unquantized flat and IVF indexes have GPU implementations;
+        HNSW and scalar-quantized flat indexes stay on the CPU, so set
+        faiss_index_type = "flat" and faiss_scalar_quantizer = "none" for
+        large corpora served from a GPU.
+
+        Returns:
+            True if searches now run on the GPU
+        """
+        if not hasattr(faiss, "StandardGpuResources") or faiss.get_num_gpus() == 0:
+            logger.warning("FAISS GPU support not available, searching on CPU")
+            return False
+        
+        base = faiss.downcast_index(
+            self.index.index if isinstance(self.index, faiss.IndexIDMap) else self.index
+        )
+        if not isinstance(base, (faiss.IndexFlat, faiss.IndexIVF)):
+            logger.warning(
+                f"{type(base).__name__} has no GPU implementation, searching on CPU "
+                f"(GPU search needs faiss_index_type = \"flat\" with "
+                f"faiss_scalar_quantizer = \"none\", or \"ivfpq\")"
+            )
+            return False
+        
+        try:
+            with self._index_lock:
+                if self._gpu_resources is None:
+                    self._gpu_resources = faiss.StandardGpuResources()
+                    self._gpu_resources.setTempMemory(temp_memory_mb * 1024 * 1024)
+                self._gpu_index = faiss.index_cpu_to_gpu(
+                    self._gpu_resources, device, self.index
+                )
+        except RuntimeError as e:
+            logger.warning(f"Index cannot be moved to GPU ({e}), searching on CPU")
+            self._gpu_index = None
+            return False
+        
+        logger.info(f"FAISS index mirrored to GPU {device}")
+        return True
+
+
+    def _add_vectors(self, embeddings: np.ndarray, first_free_id: int = 0) -> int:
+        """
+        Add vectors under consecutive ids and return the first id
+        (the faiss_index_id of the first vector)
+
+        Args:
+            embeddings: (n, d) float32 vectors
+            first_free_id: Lowest id not yet used by a chunk row
+        """
+        with self._index_lock:
+            if isinstance(self.index, faiss.IndexIDMap):
+                start_index = max(self._next_id, first_free_id)
+            else:
+                # Indexes saved before the IDMap wrapper use positional ids
+                start_index = self.index.ntotal
+            
+            if not self.index.is_trained:
+                # int8 learns per-dimension ranges, IVF-PQ its centroids and
+                # codebooks; train on the first batch
+                min_train = self._min_training_vectors()
+                if len(embeddings) < min_train:
+                    raise ValueError(
+                        f"Index needs at least {min_train} vectors in its first "
+                        f"batch to train, got {len(embeddings)}"
+                    )
+                self.index.train(embeddings)
+            
+            if isinstance(self.index, faiss.IndexIDMap):
+                ids = np.arange(start_index, start_index + len(embeddings), dtype="int64")
+                self.index.add_with_ids(embeddings, ids)
+                if self._gpu_index is not None:
+                    self._gpu_index.add_with_ids(embeddings, ids)
+            else:
+                self.index.add(embeddings)
+                if self._gpu_index is not None:
+                    self._gpu_index.add(embeddings)
+            self._next_id = start_index + len(embeddings)
+        
+        return start_index
 
 
     def add_document_chunks(
         self,
         chunks: List[Dict],
-        document_metadata: Dict
+        document_metadata: Dict,
+        session=None
     ):
         """
         Store document in DB and embeddings in FAISS.
         """
+        self.add_documents_bulk([(chunks, document_metadata)], session=session)
 
 
-        db = SessionLocal()
-
+    def add_documents_bulk(
+        self,
+        docs: List[Tuple[List[Dict], Dict]],
+        session=None
+    ):
+        """
+        Store many documents at once: one embedding batch across all of
+        their chunks, one FAISS add and one DB commit.
 
-        # 1. Create Document record
-        document = Document(
-            filename=document_metadata.get("filename"),
-            source_type=document_metadata.get("source_type"),
-            language=document_metadata.get("language"),
-            jurisdiction=document_metadata.get("jurisdiction", "Unknown")
-        )
-        db.add(document)
-        db.commit()
-        db.refresh(document)
+        Args:
+            docs: List of (chunks, document_metadata) tuples
+            session: Optional open session to reuse across calls; the
+                caller then owns the commit
+        """
+        with _session_scope(session) as db:
+            self._add_documents(db, docs)
 
 
-        # 2. Embed chunks
-        texts = [chunk["text"] for chunk in chunks]
-        embeddings = self.embedder.embed_documents(texts).astype("float32")
+    def _add_documents(self, db, docs: List[Tuple[List[Dict], Dict]]):
+        """Insert documents/chunks through db and add their vectors"""
 
 
-        # 3. Add to FAISS
-        start_index = self.index.ntotal
-        self.index.add(embeddings)
+        # 1. Create Document records
+        documents = [
+            Document(
+                filename=document_metadata.get("filename"),
+                source_type=document_metadata.get("source_type"),
+                language=document_metadata.get("language"),
+                jurisdiction=document_metadata.get("jurisdiction", "Unknown")
+            )
+            for _, document_metadata in docs
+        ]
+        db.add_all(documents)
+        db.flush()
+
+
+        # 2. Embed chunks of every document in one batch
+        all_chunks = [chunk for chunks, _ in docs for chunk in chunks]
+        if all_chunks:
+            # No-op when the embedder already returns C-contiguous float32
+            # (astype would always copy the whole (N, d) matrix)
+            embeddings = np.ascontiguousarray(
+                self.embedder.embed_chunks(all_chunks), dtype=np.float32
+            )
+            # Unit length so inner product = cosine (idempotent if the
+            # embedder already normalized)
+            faiss.normalize_L2(embeddings)
 
 
-        # 4. Store chunk records with FAISS index mapping
-        for i, chunk in enumerate(chunks):
-            chunk_record = Chunk(
-                document_id=document.id,
-                faiss_index_id=start_index + i,
-                text=chunk["text"]
+            # 3. Add to FAISS, above every id the chunks table already
+            # holds: rows are committed before the index reaches disk, so
+            # after a crash the reloaded index can be missing their ids
+            max_id = db.query(func.max(Chunk.faiss_index_id)).scalar()
+            start_index = self._add_vectors(
+                embeddings, first_free_id=0 if max_id is None else max_id + 1
             )
-            db.add(chunk_record)
 
 
-        db.commit()
-        db.close()
+            # 4. Store chunk rows with FAISS index mapping (no ORM objects)
+            rows = []
+            offset = start_index
+            for document, (chunks, _) in zip(documents, docs):
+                rows.extend(
+                    {
+                        "document_id": document.id,
+                        "faiss_index_id": offset + i,
+                        "text": chunk["text"]
+                    }
+                    for i, chunk in enumerate(chunks)
+                )
+                offset += len(chunks)
+            bulk_insert_chunks(db, rows)
 
 
-    def similarity_search(self, query: str, top_k: int = 5) -> List[Dict]:
+    def similarity_search(
+        self,
+        query: str,
+        top_k: int = 5,
+        session=None
+    ) -> List[Dict]:
         """
         Retrieve results using FAISS and fetch metadata from DB.
         """
+        query_embedding = self.embedder.embed_query(query)
+        return self.similarity_search_batch(query_embedding, top_k, session=session)[0]
 
 
-        db = SessionLocal()
+    def similarity_search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 5,
+        session=None
+    ) -> List[List[Dict]]:
+        """
+        Search many query embeddings with one FAISS call and one DB query
 
+        FAISS parallelizes over the rows of a batch but not within a single
+        query, so concurrent queries are cheaper searched together.
 
-        query_embedding = self.embedder.embed_query(query).astype("float32")
-        query_embedding = np.expand_dims(query_embedding, axis=0)
+        Args:
+            query_embeddings: (n, d) or (d,) query embeddings
+            top_k: Results per query
+            session: Optional open session
 
+        Returns:
+            One ranked result list per query
+        """
+        # Copy: normalize_L2 works in place
+        queries = np.array(query_embeddings, dtype=np.float32).reshape(
+            -1, self.embedding_dim
+        )
+        faiss.normalize_L2(queries)
 
-        scores, indices = self.index.search(query_embedding, top_k)
 
+        index = self._gpu_index if self._gpu_index is not None else self.index
+        scores, indices = index.search(queries, top_k)
 
-        results = []
 
+        # FAISS pads with -1 when fewer than top_k vectors exist
+        hits = [
+            [(int(idx), float(score)) for idx, score in zip(row_ids, row_scores) if idx >= 0]
+            for row_ids, row_scores in zip(indices, scores)
+        ]
+        ids = sorted({idx for row in hits for idx, _ in row})
 
-        for idx in indices[0]:
-            chunk = (
-                db.query(Chunk)
-                .filter(Chunk.faiss_index_id == int(idx))
-                .first()
-            )
-            if chunk:
-                results.append({
-                    "text": chunk.text,
-                    "document_id": str(chunk.document_id)
-                })
+
+        # One IN query for all hits, only the needed columns
+        rows = []
+        if ids:
+            with _session_scope(session) as db:
+                rows = (
+                    db.query(Chunk.faiss_index_id, Chunk.text, Chunk.document_id)
+                    .filter(Chunk.faiss_index_id.in_(ids))
+                    .all()
+                )
+        by_id = {row.faiss_index_id: row for row in rows}
+
+
+        # Preserve FAISS ranking
+        results = []
+        for row in hits:
+            results.append([
+                {
+                    "id": idx,
+                    "text": by_id[idx].text,
+                    "document_id": str(by_id[idx].document_id),
+                    "score": score  # cosine similarity in [-1, 1]
+                }
+                for idx, score in row if idx in by_id
+            ])
 
 
-        db.close()
         return results
 
 
-    def save_index(self, path: str = None):
+    def save_index(self, path: str = None, background: bool = False):
         """
         Save FAISS index to disk
+
+        Args:
+            path: Target file (default: the store's index_path)
+            background: Only mark the index dirty; a writer thread saves it
+                after settings.faiss_save_interval_seconds, coalescing
+                bursts of saves into one write
         """
         save_path = path or self.index_path
-        if save_path:
-            faiss.write_index(self.index, save_path)
-            print(f"Index saved to {save_path}")
-        else:
+        if not save_path:
             print("Warning: No index path specified, index not saved")
+            return
+
+        if background and save_path == self.index_path:
+            self._unsaved = True
+            self._ensure_saver()
+            self._dirty.set()
+            return
+
+        self._write_index(save_path)
+
+
+    def _write_index(self, path: str):
+        """Write to a temp file and rename, so readers never see a partial index"""
+        tmp_path = f"{path}.tmp"
+        with self._index_lock:
+            if path == self.index_path:
+                self._unsaved = False
+            faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, path)
+        print(f"Index saved to {path}")
+
+
+    def _ensure_saver(self):
+        """Start the background writer thread on first use"""
+        if self._saver is None:
+            self._closing.clear()
+            self._saver = threading.Thread(
+                target=self._saver_loop, name="faiss-index-writer", daemon=True
+            )
+            self._saver.start()
+            _open_stores.add(self)
+
+
+    def _saver_loop(self):
+        while True:
+            self._dirty.wait()
+            # Coalescing window; returns early (True) when closing
+            if self._closing.wait(settings.faiss_save_interval_seconds):
+                return
+            self._dirty.clear()
+            try:
+                self._write_index(self.index_path)
+            except Exception as e:
+                print(f"Warning: Background index save failed: {e}")
+
+
+    def close(self):
+        """Stop the background writer and flush any pending save"""
+        if self._saver is not None:
+            self._closing.set()
+            self._dirty.set()
+            self._saver.join()
+            self._saver = None
+            self._dirty.clear()
+        if self._unsaved and self.index_path:
+            self._write_index(self.index_path)
 
 
     def load_index(self, path: str):
@@ -124,8 +502,29 @@ class FAISSVectorStore:
         Load FAISS index from disk
         """
         if os.path.exists(path):
-            self.index = faiss.read_index(path)
+            index = faiss.read_index(path)
+            with self._index_lock:
+                self.index = index
+                self._next_id = max(self._next_id, self._end_of_ids(index))
             self.index_path = path
+            self._configure_search()
+            if self._gpu_index is not None:
+                self.enable_gpu()
             print(f"Index loaded from {path}")
         else:
             print(f"Warning: Index file not found at {path}")
+
+
+# Global store over settings.faiss_index_path
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> FAISSVectorStore:
+    """Get or create the global FAISS store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FAISSVectorStore(index_path=settings.faiss_index_path)
+    return _store
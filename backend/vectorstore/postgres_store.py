@@ -14,31 +14,80 @@ class PostgresVectorStore:
             conn.commit()
         # Create tables
         Base.metadata.create_all(self.engine)
+        self._migrate()
+
+    def _migrate(self):
+        """Bring tables created before JSONB / halfvec / the HNSW index up to date"""
+        from backend.db.models import create_query_log_partitions
+        with self.engine.connect() as conn:
+            column_type = conn.execute(text(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = 'chunks' AND column_name = 'metadata_json'"
+            )).scalar()
+            if column_type == "json":
+                conn.execute(text(
+                    "ALTER TABLE chunks ALTER COLUMN metadata_json "
+                    "TYPE JSONB USING metadata_json::jsonb"
+                ))
+            embedding_type = conn.execute(text(
+                "SELECT udt_name FROM information_schema.columns "
+                "WHERE table_name = 'chunks' AND column_name = 'embedding'"
+            )).scalar()
+            if embedding_type == "vector":
+                # fp32 -> fp16; the old index uses vector_cosine_ops
+                conn.execute(text("DROP INDEX IF EXISTS chunks_embedding_hnsw_idx"))
+                conn.execute(text(
+                    "ALTER TABLE chunks ALTER COLUMN embedding "
+                    "TYPE halfvec(1024) USING embedding::halfvec(1024)"
+                ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS chunks_embedding_hnsw_idx ON chunks "
+                "USING hnsw (embedding halfvec_cosine_ops) "
+                "WITH (m = 16, ef_construction = 64)"
+            ))
+            # Roll the monthly query_logs partitions forward (tables created
+            # before partitioning stay plain; relkind 'p' = partitioned)
+            relkind = conn.execute(text(
+                "SELECT relkind FROM pg_class WHERE relname = 'query_logs'"
+            )).scalar()
+            if relkind == "p":
+                create_query_log_partitions(conn)
+            conn.commit()
 
     def add_document_chunks(self, chunks, embeddings, document_metadata):
-        from backend.db.models import Document, Chunk
+        self.add_documents_bulk([(chunks, embeddings, document_metadata)])
+
+    def add_documents_bulk(self, docs):
+        """Insert many (chunk_texts, embeddings, document_metadata) in one transaction"""
+        from backend.db.models import Document, bulk_insert_chunks
         session = self.Session()
         try:
-            # 1. Create Document record
-            document = Document(
-                filename=document_metadata.get("filename"),
-                source_type=document_metadata.get("source_type"),
-                language=document_metadata.get("language"),
-                jurisdiction=document_metadata.get("jurisdiction", "Unknown")
-            )
-            session.add(document)
-            session.commit()
-            session.refresh(document)
+            # 1. Create Document records
+            documents = [
+                Document(
+                    filename=document_metadata.get("filename"),
+                    source_type=document_metadata.get("source_type"),
+                    language=document_metadata.get("language"),
+                    jurisdiction=document_metadata.get("jurisdiction", "Unknown")
+                )
+                for _, _, document_metadata in docs
+            ]
+            session.add_all(documents)
+            session.flush()
 
-            # 2. Add Chunks
-            for chunk_text, emb in zip(chunks, embeddings):
-                new_chunk = Chunk(
-                    document_id=document.id,
-                    text=chunk_text,
-                    embedding=emb,
-                    metadata_json=document_metadata
+            # 2. Add Chunks as plain row mappings (skips ORM bookkeeping)
+            rows = []
+            for document, (chunks, embeddings, document_metadata) in zip(documents, docs):
+                rows.extend(
+                    {
+                        "document_id": document.id,
+                        "text": chunk_text,
+                        "embedding": emb,
+                        "metadata_json": document_metadata
+                    }
+                    for chunk_text, emb in zip(chunks, embeddings)
                 )
-                session.add(new_chunk)
+            bulk_insert_chunks(session, rows)
             
             session.commit()
         except Exception as e:
@@ -47,17 +96,48 @@ class PostgresVectorStore:
         finally:
             session.close()
 
+    def find_near_duplicates(self, embeddings, threshold):
+        """
+        For each embedding, the filename of the nearest stored chunk if its
+        cosine similarity exceeds threshold, else None (one HNSW lookup each)
+        """
+        from backend.db.models import Chunk, Document
+        session = self.Session()
+        try:
+            matches = []
+            for embedding in embeddings:
+                distance = Chunk.embedding.cosine_distance(embedding)
+                nearest = (
+                    session.query(Document.filename, distance.label("distance"))
+                    .join(Document, Chunk.document_id == Document.id)
+                    .filter(Chunk.embedding.isnot(None))
+                    .order_by(distance)
+                    .limit(1)
+                    .first()
+                )
+                similar = nearest is not None and 1.0 - nearest.distance > threshold
+                matches.append(nearest.filename if similar else None)
+            return matches
+        finally:
+            session.close()
+
     def similarity_search(self, query_embedding, top_k=5):
         from backend.db.models import Chunk
         session = self.Session()
         try:
-            # Using Cosine Distance
-            results = session.query(Chunk).order_by(
-                Chunk.embedding.cosine_distance(query_embedding)
-            ).limit(top_k).all()
+            # Using Cosine Distance; only the returned columns are loaded
+            # (not the stored embeddings)
+            distance = Chunk.embedding.cosine_distance(query_embedding)
+            results = session.query(
+                Chunk.text, Chunk.metadata_json, distance.label("distance")
+            ).order_by(distance).limit(top_k).all()
             
             return [
-                {"text": r.text, "metadata": r.metadata_json or {}} 
+                {
+                    "text": r.text,
+                    "metadata": r.metadata_json or {},
+                    "score": 1.0 - r.distance  # cosine similarity, as in FAISS
+                }
                 for r in results
             ]
         finally:
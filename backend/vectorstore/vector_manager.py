@@ -1,8 +1,57 @@
 from backend.vectorstore.faiss_store import FAISSVectorStore
 from backend.vectorstore.postgres_store import PostgresVectorStore
-from backend.embeddings.embedder import EmbeddingModel
+from backend.embeddings.embedder import get_embedder
+from backend.core.logging import get_logger
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+import faiss
+import itertools
+import numpy as np
 import os
 
+logger = get_logger()
+
+# Runs pgvector lookups concurrently with the FAISS search
+_search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pg-search")
+
+
+# Bumped on every add; lets caches keyed on search results (the RAG
+# response cache) notice that the corpus changed, across all managers
+_corpus_version = itertools.count(1)
+_current_version = 0
+
+
+def corpus_version() -> int:
+    """Counter of document additions made in this process"""
+    return _current_version
+
+
+def _bump_corpus_version():
+    global _current_version
+    _current_version = next(_corpus_version)
+
+
+def _near_duplicates(embeddings: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    For each row, the earlier row it nearly duplicates (cosine similarity
+    above threshold), or -1 if none
+
+    Exact range search over the batch, so every neighbour above the
+    threshold is seen, not just the nearest; each row points at the
+    earliest row of its group, which is the one kept.
+    """
+    xb = np.ascontiguousarray(embeddings, dtype=np.float32)
+    index = faiss.IndexFlatIP(xb.shape[1])
+    index.add(xb)
+    lims, sims, ids = index.range_search(xb, threshold)
+    rows = np.repeat(np.arange(len(xb)), np.diff(lims.astype(np.int64)))
+    earlier = (ids < rows) & (sims > threshold)
+
+    duplicate_of = np.full(len(xb), len(xb), dtype=np.int64)
+    np.minimum.at(duplicate_of, rows[earlier], ids[earlier])
+    duplicate_of[duplicate_of == len(xb)] = -1
+    return duplicate_of
+
 
 class VectorManager:
     """
@@ -21,30 +70,142 @@ class VectorManager:
             index_path="data/indexes/faiss_user.index"
         )
         
-        self.embedder = EmbeddingModel()
+        self.embedder = get_embedder()
 
     def add_general_documents(self, chunks, metadata):
         """Add documents to the persistent database store"""
         metadata["source"] = "general"
         texts = [c["text"] if isinstance(c, dict) else c for c in chunks]
-        embeddings = self.embedder.embed_documents(texts)
+        embeddings = self.embedder.embed_chunks(chunks)
         self.general_store.add_document_chunks(texts, embeddings, metadata)
+        _bump_corpus_version()
+
+    def add_general_documents_bulk(self, docs, dedup_threshold: float = 0):
+        """
+        Add many (chunks, metadata) documents to the persistent store,
+        embedding all of their chunks in a single batch
+
+        Args:
+            docs: List of (chunks, metadata) tuples
+            dedup_threshold: Drop chunks whose cosine similarity to an
+                earlier chunk of the batch, or to a stored chunk, exceeds
+                this (0 keeps all)
+        """
+        all_chunks = [c for chunks, _ in docs for c in chunks]
+        embeddings = self.embedder.embed_chunks(all_chunks) if all_chunks else []
+
+        keep_rows = None
+        if dedup_threshold and all_chunks:
+            duplicate_of = _near_duplicates(embeddings, dedup_threshold)
+            # Chunks unique within the batch are checked against the store
+            unique = np.flatnonzero(duplicate_of < 0)
+            stored = self.general_store.find_near_duplicates(
+                embeddings[unique], dedup_threshold
+            )
+            stored_match = {
+                int(row): filename
+                for row, filename in zip(unique, stored) if filename is not None
+            }
+            self._log_dropped_duplicates(docs, duplicate_of, stored_match)
+            keep_rows = duplicate_of < 0
+            keep_rows[list(stored_match)] = False
+
+        batch = []
+        offset = 0
+        for chunks, metadata in docs:
+            metadata["source"] = "general"
+            texts = [c["text"] if isinstance(c, dict) else c for c in chunks]
+            vectors = embeddings[offset:offset + len(chunks)]
+            if keep_rows is not None:
+                keep = keep_rows[offset:offset + len(chunks)]
+                texts = [t for t, k in zip(texts, keep) if k]
+                vectors = vectors[keep]
+            offset += len(chunks)
+            if texts:
+                batch.append((texts, vectors, metadata))
+
+        self.general_store.add_documents_bulk(batch)
+        _bump_corpus_version()
+
+    @staticmethod
+    def _log_dropped_duplicates(docs, duplicate_of, stored_match):
+        """
+        Log every dropped chunk with the file and chunk it duplicated
+
+        Args:
+            docs: (chunks, metadata) tuples of the batch
+            duplicate_of: Earlier batch row each row duplicates, or -1
+            stored_match: Batch row -> filename of the stored chunk it duplicates
+        """
+        owners = [
+            (metadata.get("file_path") or metadata.get("filename", "unknown"), i)
+            for chunks, metadata in docs
+            for i in range(len(chunks))
+        ]
+        dropped = 0
+        for row in range(len(duplicate_of)):
+            # Follow chains of duplicates to the first row of the group
+            kept = row
+            while duplicate_of[kept] >= 0:
+                kept = duplicate_of[kept]
+            if kept in stored_match:
+                match = f"a stored chunk of {stored_match[kept]}"
+            elif kept != row:
+                kept_source, kept_index = owners[kept]
+                match = f"chunk {kept_index} of {kept_source}"
+            else:
+                continue
+            source, index = owners[row]
+            logger.info(f"Dropped near-duplicate chunk {index} of {source} (matches {match})")
+            dropped += 1
+        logger.info(f"Dropped {dropped} near-duplicate chunks")
 
     def add_user_documents(self, chunks, metadata):
         """Add documents to the local FAISS index (session-only)"""
         metadata["source"] = "user"
         self.user_store.add_document_chunks(chunks, metadata)
-        self.user_store.save_index()
+        self.user_store.save_index(background=True)
+        _bump_corpus_version()
+
+    def add_user_documents_bulk(self, docs):
+        """Add many (chunks, metadata) documents to FAISS, saving the index once"""
+        for _, metadata in docs:
+            metadata["source"] = "user"
+        self.user_store.add_documents_bulk(docs)
+        self.user_store.save_index(background=True)
+        _bump_corpus_version()
+
+    def corpus_fingerprint(self) -> str:
+        """
+        Identifies the searchable corpus across restarts, unlike
+        corpus_version (additions in this process): chunk row count and
+        newest row in the database, plus vectors in the user index
+        """
+        from backend.db.models import Chunk
+        session = self.general_store.Session()
+        try:
+            count, newest = session.query(
+                func.count(Chunk.id), func.max(Chunk.created_at)
+            ).one()
+        finally:
+            session.close()
+        newest = newest.isoformat() if newest else ""
+        return f"{count}:{newest}:{self.user_store.index.ntotal}"
 
     def search(self, query, top_k=5):
         """Hybrid search with priority for user documents"""
         query_emb = self.embedder.embed_query(query)
         
-        # Search User FAISS first
-        user_results = self.user_store.similarity_search(query, top_k)
+        # Start the General Postgres search (a network round-trip) first,
+        # so it overlaps with the in-process FAISS search
+        general_future = _search_pool.submit(
+            self.general_store.similarity_search, query_emb, top_k
+        )
+        
+        # Search User FAISS (reusing the query embedding)
+        user_results = self.user_store.similarity_search_batch(query_emb, top_k)[0]
         
-        # Search General Postgres
-        general_results = self.general_store.similarity_search(query_emb, top_k)
+        general_results = general_future.result()
 
         # Merge results, prioritizing user docs
         combined = user_results + general_results
@@ -3,30 +3,73 @@ Ingest General Laws Script
 Processes legal documents and adds them to the vector store
 """
 
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from backend.ingestion.loaders import load_document
-from backend.ingestion.preprocessing import preprocess_text
-from backend.chunking.legal_chunker import chunk_document
-from backend.embeddings.embedder import get_embedder
-from backend.vectorstore.faiss_store import get_store
+from backend.ingestion.preprocessing import preprocess_document
+from backend.chunking.legal_chunker import LegalChunker
+from backend.vectorstore.vector_manager import VectorManager
 from backend.core.config import settings
-from backend.core.logging import get_logger
+from backend.core.logging import get_logger, setup_logging
 
 logger = get_logger()
 
+# Per worker process; the tokenizer is loaded on first use
+_chunker = None
 
-def ingest_directory(directory: Path, category: str):
+
+def _get_chunker() -> LegalChunker:
+    global _chunker
+    if _chunker is None:
+        _chunker = LegalChunker()
+    return _chunker
+
+
+def _load_prep_chunk(task):
+    """
+    Load, preprocess and chunk one file (runs in a worker process)
+    
+    Args:
+        task: (file_path, category)
+    
+    Returns:
+        (chunks, metadata), or None if the file failed
+    """
+    file_path, category = task
+    try:
+        doc = load_document(str(file_path))
+        text, metadata = preprocess_document(doc["text"], doc["metadata"])
+        metadata.update({
+            "category": category,
+            "file_path": str(file_path),
+            "jurisdiction": "India",
+        })
+        chunks = _get_chunker().chunk_text(text, metadata)
+        logger.info(f"✓ Prepared {file_path.name}: {len(chunks)} chunks")
+        return chunks, metadata
+    except Exception as e:
+        logger.error(f"✗ Failed to ingest {file_path.name}: {e}")
+        return None
+
+
+def ingest_directory(directory: Path, category: str, vector_manager: VectorManager = None):
     """
     Ingest all documents from a directory
     
+    Files are loaded, preprocessed and chunked in parallel worker
+    processes; all chunks are then embedded as one batch and stored in a
+    single transaction.
+    
     Args:
         directory: Path to directory containing documents
         category: Legal category (e.g., 'eviction', 'labor')
+        vector_manager: Target stores (created if not given)
     """
     logger.info(f"Ingesting documents from {directory}")
     
@@ -42,57 +85,42 @@ def ingest_directory(directory: Path, category: str):
     
     logger.info(f"Found {len(files)} documents to process")
     
-    embedder = get_embedder()
-    store = get_store()
+    # CPU-bound load/OCR/preprocess/chunk stages, one file per task
+    workers = min(len(files), max(1, (os.cpu_count() or 2) - 1))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_load_prep_chunk, [(f, category) for f in files]))
+    docs = [result for result in results if result is not None and result[0]]
+    
+    if not docs:
+        logger.warning(f"Nothing to index in {directory}")
+        return
     
-    for file_path in files:
-        try:
-            logger.info(f"Processing: {file_path.name}")
-            
-            # Load document
-            text = load_document(str(file_path))
-            
-            # Preprocess
-            text = preprocess_text(text, deep_clean=True)
-            
-            # Chunk
-            chunks = chunk_document(text, preserve_sections=True)
-            
-            # Add metadata
-            for chunk in chunks:
-                chunk['source'] = file_path.name
-                chunk['category'] = category
-                chunk['file_path'] = str(file_path)
-            
-            # Generate embeddings
-            chunk_texts = [c['text'] for c in chunks]
-            embeddings = embedder.embed_batch(chunk_texts)
-            
-            # Add to store
-            store.add_documents(embeddings, chunks)
-            
-            logger.info(f"✓ Ingested {file_path.name}: {len(chunks)} chunks")
-            
-        except Exception as e:
-            logger.error(f"✗ Failed to ingest {file_path.name}: {e}")
+    # One embedding batch across all files, minus near-duplicate chunks
+    vector_manager = vector_manager or VectorManager()
+    vector_manager.add_general_documents_bulk(
+        docs, dedup_threshold=settings.ingest_dedup_threshold
+    )
     
-    # Save index
-    store.save(settings.faiss_index_path)
-    logger.info(f"Index saved to {settings.faiss_index_path}")
+    logger.info(
+        f"✓ Ingested {len(docs)}/{len(files)} documents "
+        f"({sum(len(chunks) for chunks, _ in docs)} chunks) from {directory}"
+    )
 
 
 def main():
     """Main ingestion script"""
+    setup_logging()
     logger.info("Starting general laws ingestion")
     
     base_path = Path(__file__).parent.parent / "data" / "general_laws"
     
     categories = ["eviction", "labor", "welfare"]
+    vector_manager = VectorManager()
     
     for category in categories:
         category_path = base_path / category
         if category_path.exists():
-            ingest_directory(category_path, category)
+            ingest_directory(category_path, category, vector_manager)
     
     logger.info("Ingestion complete!")
 
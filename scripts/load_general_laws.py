@@ -1,6 +1,9 @@
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from queue import Queue
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -9,18 +12,25 @@ from backend.ingestion.loaders import load_document
 from backend.ingestion.preprocessing import preprocess_document
 from backend.chunking.legal_chunker import LegalChunker
 from backend.vectorstore.vector_manager import VectorManager
+from backend.core.config import settings
 
 
 DATA_PATH = "data/general_laws"
+LOADER_THREADS = 8
+# Chunks gathered before one embedding batch + one DB transaction
+EMBED_BATCH_CHUNKS = 512
 
 
-chunker = LegalChunker()
 vector_manager = VectorManager()
 
+# One chunker per loader thread (tokenizers are not shared across threads)
+_local = threading.local()
+
 
 
 
 def process_file(file_path):
+    """Load, preprocess and chunk one file; returns (chunks, metadata) or None"""
     ext = file_path.split(".")[-1]
 
 
@@ -30,23 +40,73 @@ def process_file(file_path):
 
         metadata["jurisdiction"] = "India"
 
-        chunks = chunker.chunk_text(clean_text, metadata)
-
-        vector_manager.add_general_documents(chunks, metadata)
-        print(f"Successfully indexed: {file_path}")
+        if not hasattr(_local, "chunker"):
+            _local.chunker = LegalChunker()
+        chunks = _local.chunker.chunk_text(clean_text, metadata)
+        return chunks, metadata
         
     except Exception as e:
         print(f"Failed to process {file_path}: {e}")
+        return None
+
+
+def index_batch(docs):
+    """Embed and store a batch of documents in one call; a failed batch is reported and skipped"""
+    try:
+        vector_manager.add_general_documents_bulk(
+            docs, dedup_threshold=settings.ingest_dedup_threshold
+        )
+    except Exception as e:
+        print(f"Failed to index batch of {len(docs)} files: {e}")
+        for _, metadata in docs:
+            print(f"  Not indexed: {metadata['file_path']}")
+        return
+    for _, metadata in docs:
+        print(f"Successfully indexed: {metadata['file_path']}")
+
+
+
+
+files = [
+    os.path.join(root, file)
+    for root, _, filenames in os.walk(DATA_PATH)
+    for file in filenames
+    if file.endswith(('.txt', '.pdf', '.docx', '.doc'))
+]
+
+# Producers: loader threads (OCR, PDF parsing and tokenization release the
+# GIL) push prepared documents; None marks the end
+prepared = Queue(maxsize=4 * LOADER_THREADS)
+
+
+def produce(path):
+    print("Loading:", path)
+    result = process_file(path)
+    if result is not None and result[0]:
+        prepared.put(result)
+
+
+def produce_all():
+    try:
+        with ThreadPoolExecutor(max_workers=LOADER_THREADS) as pool:
+            list(pool.map(produce, files))
+    finally:
+        prepared.put(None)
 
 
+threading.Thread(target=produce_all, name="general-laws-loader", daemon=True).start()
 
+# Consumer: embed in large batches so the encoder stays saturated
+batch, batch_chunks = [], 0
+while (item := prepared.get()) is not None:
+    batch.append(item)
+    batch_chunks += len(item[0])
+    if batch_chunks >= EMBED_BATCH_CHUNKS:
+        index_batch(batch)
+        batch, batch_chunks = [], 0
 
-for root, _, files in os.walk(DATA_PATH):
-    for file in files:
-        if file.endswith(('.txt', '.pdf', '.docx', '.doc')):
-            path = os.path.join(root, file)
-            print("Loading:", path)
-            process_file(path)
+if batch:
+    index_batch(batch)
 
 
 print("General laws processed.")
@@ -5,17 +5,55 @@ Tests all document loaders and OCR functionality
 Run with: python scripts/test_ingestion.py
 """
 
+import io
+import os
 import sys
+import multiprocessing
+from contextlib import redirect_stdout
+from functools import lru_cache
 from pathlib import Path
 
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from backend.ingestion.loaders import load_document, DocumentLoader
-from backend.core.logging import get_logger
+from backend.core.logging import get_logger, setup_logging
 
 logger = get_logger()
 
+SAMPLE_DIR = "data/samples/test_docs"
+TXT_SAMPLE_PATH = f"{SAMPLE_DIR}/sample_eviction.txt"
+
+
+@lru_cache(maxsize=1)
+def sample_files() -> frozenset:
+    """Names in the sample directory, from one readdir (no stat per file)"""
+    try:
+        with os.scandir(SAMPLE_DIR) as entries:
+            return frozenset(entry.name for entry in entries)
+    except FileNotFoundError:
+        return frozenset()
+
+
+def ensure_txt_sample():
+    """Create the TXT sample if missing (shared by the TXT and auto-detect tests)"""
+    file_path = TXT_SAMPLE_PATH
+    
+    if Path(file_path).name not in sample_files():
+        print(f"⚠️  Sample file not found: {file_path}")
+        print("Creating sample file...")
+        
+        # Create sample if missing
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        sample_text = """Section 106 of the Transfer of Property Act
+            
+A lease of immovable property determines by efflux of the time limited thereby.
+The landlord must provide proper notice before eviction."""
+        
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(sample_text)
+        sample_files.cache_clear()
+
 
 def test_txt_loading():
     """Test TXT file loading"""
@@ -24,21 +62,8 @@ def test_txt_loading():
     print("="*60)
     
     try:
-        file_path = "data/samples/test_docs/sample_eviction.txt"
-        
-        if not Path(file_path).exists():
-            print(f"⚠️  Sample file not found: {file_path}")
-            print("Creating sample file...")
-            
-            # Create sample if missing
-            Path(file_path).parent.mkdir(parents=True, exist_ok=True)
-            sample_text = """Section 106 of the Transfer of Property Act
-            
-A lease of immovable property determines by efflux of the time limited thereby.
-The landlord must provide proper notice before eviction."""
-            
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(sample_text)
+        file_path = TXT_SAMPLE_PATH
+        ensure_txt_sample()
         
         doc = load_document(file_path, "txt")
         
@@ -89,9 +114,9 @@ def test_docx_loading():
     print("="*60)
     
     try:
-        file_path = "data/samples/test_docs/sample.docx"
+        file_path = f"{SAMPLE_DIR}/sample.docx"
         
-        if not Path(file_path).exists():
+        if "sample.docx" not in sample_files():
             print(f"⚠️  No DOCX sample found: {file_path}")
             print("⏭️  Skipping DOCX test (manual file required)")
             print("\nTo test DOCX:")
@@ -123,9 +148,9 @@ def test_pdf_loading():
     print("="*60)
     
     try:
-        file_path = "data/samples/test_docs/sample.pdf"
+        file_path = f"{SAMPLE_DIR}/sample.pdf"
         
-        if not Path(file_path).exists():
+        if "sample.pdf" not in sample_files():
             print(f"⚠️  No PDF sample found: {file_path}")
             print("⏭️  Skipping PDF test (manual file required)")
             print("\nTo test PDF:")
@@ -157,7 +182,7 @@ def test_auto_detection():
     print("="*60)
     
     try:
-        file_path = "data/samples/test_docs/sample_eviction.txt"
+        file_path = TXT_SAMPLE_PATH
         
         # Load without specifying type
         doc = load_document(file_path)  # No source_type argument
@@ -247,20 +272,48 @@ def test_ocr_capability():
         return None
 
 
+TESTS = [
+    ('txt', test_txt_loading),
+    ('plain', test_plain_text),
+    ('auto_detect', test_auto_detection),
+    ('unicode', test_unicode_support),
+    ('ocr', test_ocr_capability),
+    ('docx', test_docx_loading),
+    ('pdf', test_pdf_loading),
+]
+
+
+def run_test(test):
+    """Run one (name, test_fn) in a worker, capturing its output"""
+    name, test_fn = test
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        result = test_fn()
+    return name, result, buffer.getvalue()
+
+
 def main():
     """Run all ingestion tests"""
+    setup_logging()
     print("\n" + "📄 DOCUMENT INGESTION TEST SUITE 📄".center(60))
     
-    results = {}
+    # Auto-detection reads the TXT sample; create it before tests run concurrently.
+    # The directory listing is taken here too, so forked workers inherit it.
+    ensure_txt_sample()
+    sample_files()
     
-    # Run tests
-    results['txt'] = test_txt_loading()
-    results['plain'] = test_plain_text()
-    results['auto_detect'] = test_auto_detection()
-    results['unicode'] = test_unicode_support()
-    results['ocr'] = test_ocr_capability()
-    results['docx'] = test_docx_loading()
-    results['pdf'] = test_pdf_loading()
+    # One Tesseract thread per worker so parallel OCR doesn't oversubscribe cores
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    
+    # Tests are independent; run them on separate cores (PDF/OCR dominates)
+    workers = min(len(TESTS), max(1, (os.cpu_count() or 2) - 1))
+    with multiprocessing.Pool(workers) as pool:
+        outcomes = pool.map(run_test, TESTS)
+    
+    results = {}
+    for name, result, output in outcomes:
+        print(output, end="")
+        results[name] = result
     
     # Summary
     print("\n" + "="*60)
@@ -13,6 +13,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from backend.embeddings.embedder import EmbeddingModel
 from backend.rag.generator import LegalLLM
+from backend.core.logging import setup_logging
 import numpy as np
 
 
@@ -194,6 +195,7 @@ def test_full_pipeline():
 
 def main():
     """Run all tests"""
+    setup_logging()
     print("\n" + "🔬 NYAASAHAYAK - MODEL TESTING SUITE 🔬".center(60))
     
     results = {
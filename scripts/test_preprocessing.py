@@ -18,6 +18,7 @@ from backend.ingestion.preprocessing import (
     normalize_whitespace,
     preserve_legal_structure
 )
+from backend.core.logging import setup_logging
 
 
 def test_basic_preprocessing():
@@ -330,6 +331,7 @@ Copyright 2024. All rights reserved.
 
 def main():
     """Run all preprocessing tests"""
+    setup_logging()
     print("\n" + "🧹 TEXT PREPROCESSING TEST SUITE 🧹".center(60))
     
     results = {}
@@ -4,14 +4,31 @@ import os
 from backend.ingestion.loaders import load_document
 from backend.ingestion.preprocessing import preprocess_document
 from backend.chunking.legal_chunker import LegalChunker
-from backend.vectorstore.vector_manager import VectorManager
 from backend.rag.pipeline import LegalRAGPipeline
+from backend.core.logging import setup_logging
+
+
+# Streamlit reruns this script on every interaction; setup is idempotent
+setup_logging()
+
+
+@st.cache_resource
+def get_rag_pipeline():
+    """Load the RAG pipeline (LLM, embedder, indexes) once per server process"""
+    return LegalRAGPipeline()
+
+
+@st.cache_resource
+def get_chunker():
+    """Load the chunker (and its tokenizer) once per server process"""
+    return LegalChunker()
 
 
 # Initialize core components
-chunker = LegalChunker()
-vector_manager = VectorManager()
-rag_pipeline = LegalRAGPipeline()
+chunker = get_chunker()
+rag_pipeline = get_rag_pipeline()
+# Uploads go into the pipeline's own user store, so answers can use them
+vector_manager = rag_pipeline.vector_manager
 
 
 # ---------------- Sidebar ----------------
@@ -36,7 +53,12 @@ st.sidebar.warning(
 
 
 # ---------------- Document Processing ----------------
-if uploaded_file is not None:
+if "indexed_files" not in st.session_state:
+    st.session_state.indexed_files = set()
+
+
+# The uploader keeps its file across reruns; index each upload once
+if uploaded_file is not None and uploaded_file.file_id not in st.session_state.indexed_files:
     file_path = os.path.join("data/samples/test_docs", uploaded_file.name)
 
     # Ensure the directory exists
@@ -61,6 +83,7 @@ if uploaded_file is not None:
     # Add to USER vector store
     vector_manager.add_user_documents(chunks, metadata)
 
+    st.session_state.indexed_files.add(uploaded_file.file_id)
     st.sidebar.success("Document processed and indexed.")
 
 
@@ -71,6 +94,16 @@ if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
 
+# Display chat history
+for role, message in st.session_state.chat_history:
+    if role == "user":
+        with st.chat_message("user"):
+            st.write(message)
+    else:
+        with st.chat_message("assistant"):
+            st.write(message)
+
+
 # User input
 user_query = st.chat_input("Ask your legal question...")
 
@@ -78,19 +111,12 @@ user_query = st.chat_input("Ask your legal question...")
 if user_query:
     # Save user message
     st.session_state.chat_history.append(("user", user_query))
+    with st.chat_message("user"):
+        st.write(user_query)
 
-    # Get response from RAG
-    response = rag_pipeline.answer_query(user_query)
+    # Stream the response from RAG as it is generated
+    with st.chat_message("assistant"):
+        response = st.write_stream(rag_pipeline.answer_query_stream(user_query))
 
     # Save assistant message
     st.session_state.chat_history.append(("assistant", response))
-
-
-# Display chat history
-for role, message in st.session_state.chat_history:
-    if role == "user":
-        with st.chat_message("user"):
-            st.write(message)
-    else:
-        with st.chat_message("assistant"):
-            st.write(message)